@@ -1,8 +1,11 @@
 import json
+import os
 import traceback
 from typing import Optional
+from urllib.parse import quote
 
 from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
@@ -173,6 +176,8 @@ async def list_documents(
     page_size: int = 20,
     template_id: Optional[int] = None,
     status: Optional[str] = None,
+    cursor: Optional[str] = None,
+    include_total: bool = True,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
@@ -183,10 +188,27 @@ async def list_documents(
     - **page_size**: 每页数量
     - **template_id**: 过滤模板ID
     - **status**: 过滤状态（pending, processing, completed, failed）
+    - **cursor**: 上一页返回的 next_cursor，传入时忽略 page 直接翻到下一页
+    - **include_total**: 是否返回总数，无限滚动场景可传 false 省去计数
     """
+    seek = None
+    if cursor:
+        try:
+            upload_time, document_id = map(int, cursor.split("_"))
+        except ValueError:
+            # 这里的 status 是查询参数，不能使用 fastapi.status 常量
+            raise HTTPException(status_code=400, detail="无效的分页游标")
+        seek = (upload_time, document_id)
+
     skip = (page - 1) * page_size
     documents, total = await DocumentService.list_documents(
-        db, skip=skip, limit=page_size, template_id=template_id, status=status
+        db,
+        skip=skip,
+        limit=page_size,
+        template_id=template_id,
+        status=status,
+        cursor=seek,
+        include_total=include_total,
     )
 
     # 获取映射表信息
@@ -218,9 +240,15 @@ async def list_documents(
     return ResponseBase(
         data=PaginatedResponse(
             total=total,
-            page=page,
+            # 游标分页时 page 参数被忽略，不回显以免误导调用方
+            page=None if cursor else page,
             page_size=page_size,
             items=response_items,
+            next_cursor=(
+                f"{documents[-1].upload_time}_{documents[-1].id}"
+                if len(documents) == page_size
+                else None
+            ),
         )
     )
 
@@ -304,6 +332,32 @@ async def get_download_url(
     )
 
 
+@router.get("/{document_id}/file")
+async def download_file(
+    document_id: int,
+    db: AsyncSession = Depends(get_db),
+    storage: StorageClient = Depends(get_storage),
+    current_user: User = Depends(get_current_user),
+):
+    """下载文档原文件（流式返回，不在内存中缓存整个文件）"""
+    file_object = await DocumentService.get_file_object(db, document_id)
+    if not file_object or not await storage.exists_async(file_object[1]):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="文件不存在",
+        )
+
+    document, object_name = file_object
+    filename = getattr(document, "original_filename") or object_name.rsplit("/", 1)[-1]
+    return StreamingResponse(
+        storage.iter_file(object_name),
+        media_type=DocumentService._get_content_type(os.path.splitext(filename)[1]),
+        headers={
+            "Content-Disposition": f"attachment; filename*=UTF-8''{quote(filename)}"
+        },
+    )
+
+
 @router.get("/{document_id}/class-code", response_model=ResponseBase)
 async def get_document_class_code(
     document_id: int,
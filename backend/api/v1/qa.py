@@ -4,7 +4,6 @@ import traceback
 import uuid
 from typing import Any, Dict, Optional
 
-from elasticsearch import AsyncElasticsearch
 from fastapi import APIRouter, Depends, HTTPException, Request, status
 from loguru import logger
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -128,6 +127,7 @@ async def ask_question_agent_stream(
     qa_request: QARequest,
     db: AsyncSession = Depends(get_db),
     config: DynamicConfig = Depends(get_config),
+    search_engine: SearchEngine = Depends(get_search_engine),
     current_user: User = Depends(get_current_user),
 ):
     """
@@ -155,17 +155,15 @@ async def ask_question_agent_stream(
 
     async def event_generator():
         """SSE事件生成器"""
-        es_client = None  # 初始化
         # 生成会话/任务ID（整个流程使用同一个UUID）
         task_id = str(uuid.uuid4())
+        # 复用全局搜索引擎的连接池，而不是每次请求新建客户端；
+        # 整个流期间持有客户端，热更新时旧连接等本次问答结束后再关闭
+        es_client = search_engine.acquire()
         try:
             # 生成会话ID
             session_id = str(uuid.uuid4())
 
-            # 初始化Elasticsearch客户端
-            es_client = AsyncElasticsearch(
-                [config.ELASTICSEARCH_URL], verify_certs=False
-            )
             # 构造初始状态 (优化后的状态机)
             initial_state: RetrievalState = {
                 # 必需输入
@@ -236,7 +234,7 @@ async def ask_question_agent_stream(
                 node_name = list(step_result.keys())[0]
                 state_data = step_result[node_name]
 
-                print(f"[LangGraph Node] {node_name}")
+                logger.debug("[LangGraph Node] {}", node_name)
 
                 # 第一个节点是 intent_routing，根据执行计划生成前端渲染步骤
                 if first_step and node_name == "intent_routing":
@@ -626,9 +624,7 @@ async def ask_question_agent_stream(
                 done=True,
             ).model_dump_json()
         finally:
-            # 关闭Elasticsearch客户端
-            if es_client:
-                await es_client.close()
+            search_engine.release()
 
     return EventSourceResponse(event_generator())
 
@@ -641,6 +637,7 @@ async def clarify_question_agent(
     session_id: str,
     db: AsyncSession = Depends(get_db),
     config: DynamicConfig = Depends(get_config),
+    search_engine: SearchEngine = Depends(get_search_engine),
     current_user: User = Depends(get_current_user),
 ):
     """
@@ -668,9 +665,11 @@ async def clarify_question_agent(
 
     async def event_generator():
         """SSE事件生成器"""
-        es_client = None  # 初始化
         # 生成会话/任务ID（整个流程使用同一个UUID）
         task_id = str(uuid.uuid4())
+        # 复用全局搜索引擎的连接池，而不是每次请求新建客户端；
+        # 整个流期间持有客户端，热更新时旧连接等本次问答结束后再关闭
+        es_client = search_engine.acquire()
         try:
             # 检查会话ID是否存在
             if session_id not in graph_state_storage:
@@ -687,10 +686,6 @@ async def clarify_question_agent(
             # 清除歧义消息
             stored_state["ambiguity_message"] = None
 
-            # 初始化Elasticsearch客户端
-            es_client = AsyncElasticsearch(
-                [config.ELASTICSEARCH_URL], verify_certs=False
-            )
             stored_state["es_client"] = es_client
 
             # 发送开始处理消息
@@ -773,8 +768,6 @@ async def clarify_question_agent(
                 done=True,
             ).model_dump_json()
         finally:
-            # 关闭Elasticsearch客户端
-            if es_client:
-                await es_client.close()
+            search_engine.release()
 
     return EventSourceResponse(event_generator())
@@ -1,5 +1,6 @@
 import asyncio
 import os
+from functools import lru_cache, reduce
 from typing import Any, List, Optional
 
 import yaml
@@ -7,6 +8,26 @@ from loguru import logger
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from v2.nacos import ClientConfigBuilder, ConfigParam, GRPCConfig, NacosConfigService
 
+# 优先使用 libyaml 的 C 实现解析配置，不可用时退回纯 Python 实现
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+
+# 缓存未命中标记
+_MISSING = object()
+
+
+@lru_cache(maxsize=512)
+def _split_path(key_path: str) -> tuple[str, ...]:
+    """拆分配置路径(如 "storage.type")"""
+    return tuple(key_path.split("."))
+
+
+def _get_child(node: Any, key: str) -> Any:
+    """按键取下一级配置，不存在时返回 _MISSING"""
+    return node.get(key, _MISSING) if isinstance(node, dict) else _MISSING
+
 
 class LocalSettings(BaseSettings):
     """静态配置类 - 从.env读取,应用启动前就确定的配置"""
@@ -35,14 +56,23 @@ class DynamicConfig:
         self._config_data: dict[str, Any] = {}
         self.nacos_config_service: Optional[NacosConfigService] = None
         self._on_config_change_callbacks: List[callable] = []  # 配置变更回调
+        self._value_cache: dict[tuple[str, Any], Any] = {}  # 配置项解析结果缓存
+        self._last_yaml: Optional[str] = None  # 最近一次成功加载的YAML内容
 
     def load_from_yaml(self, yaml_content: str) -> None:
         """从YAML内容加载配置"""
+        # 内容未变化时无需重新解析
+        if yaml_content == self._last_yaml:
+            logger.debug("动态配置内容未变化,跳过加载")
+            return
+
         try:
-            new_config = yaml.safe_load(yaml_content)
+            new_config = yaml.load(yaml_content, Loader=_YamlLoader)
             if isinstance(new_config, dict):
                 old_config = self._config_data.copy()
                 self._config_data = new_config
+                self._value_cache.clear()
+                self._last_yaml = yaml_content
                 logger.info("✅ 动态配置已更新")
 
                 # 触发配置变更回调
@@ -68,7 +98,19 @@ class DynamicConfig:
                 logger.error(f"配置变更回调执行失败 [{callback.__name__}]: {e}")
 
     def _get_config(self, key_path: str, default: Any = None) -> Any:
-        """从配置中获取值，支持环境变量优先"""
+        """从配置中获取值，支持环境变量优先
+
+        解析结果会被缓存，Nacos 配置变更时清空
+        """
+        cache_key = (key_path, default)
+        value = self._value_cache.get(cache_key, _MISSING)
+        if value is _MISSING:
+            value = self._resolve_config(key_path, default)
+            self._value_cache[cache_key] = value
+        return value
+
+    def _resolve_config(self, key_path: str, default: Any = None) -> Any:
+        """解析配置值(环境变量 > Nacos配置 > 默认值)"""
         # 优先从环境变量获取
         env_key = key_path.upper().replace(".", "_")
         env_value = os.getenv(env_key)
@@ -84,14 +126,8 @@ class DynamicConfig:
             return env_value
 
         # 从Nacos配置中获取
-        keys = key_path.split(".")
-        value = self._config_data
-        try:
-            for key in keys:
-                value = value[key]
-            return value if value is not None else default
-        except (KeyError, TypeError):
-            return default
+        value = reduce(_get_child, _split_path(key_path), self._config_data)
+        return default if value is _MISSING or value is None else value
 
     # 静态配置访问(直接从LocalSettings获取)
     @property
@@ -158,6 +194,11 @@ class DynamicConfig:
     def STORAGE_ROOT(self) -> str:
         return self._get_config("storage.root", "/")
 
+    @property
+    def STORAGE_MAX_CONCURRENCY(self) -> int:
+        """同时发往对象存储的请求数上限"""
+        return self._get_config("storage.max_concurrency", 64)
+
     # Elasticsearch配置
     @property
     def ELASTICSEARCH_URL(self) -> str:
@@ -167,6 +208,11 @@ class DynamicConfig:
     def ELASTICSEARCH_INDEX(self) -> str:
         return self._get_config("search.elastic_index", "dochive_documents")
 
+    @property
+    def ELASTICSEARCH_BULK_CONCURRENCY(self) -> int:
+        """同时进行的 _bulk 写入请求数上限(默认CPU核数)"""
+        return self._get_config("search.bulk_concurrency", os.cpu_count() or 4)
+
     # ClickHouse配置
     @property
     def CLICKHOUSE_HOST(self) -> str:
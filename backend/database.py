@@ -1,6 +1,7 @@
 from typing import Optional
 
 from loguru import logger
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import (
     AsyncEngine,
     AsyncSession,
@@ -102,3 +103,10 @@ async def init_db(config: DynamicConfig):
 
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        # create_all 不会给已存在的表补建索引，老库在启动时补上游标分页索引
+        await conn.execute(
+            text(
+                "CREATE INDEX IF NOT EXISTS ix_documents_upload_time_id "
+                "ON documents (upload_time DESC, id DESC)"
+            )
+        )
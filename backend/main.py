@@ -1,3 +1,4 @@
+import asyncio
 import logging
 import traceback
 from contextlib import asynccontextmanager
@@ -64,6 +65,8 @@ async def lifespan(app: FastAPI):
         logger.warning(f"⚠️ LLM客户端初始化失败: {e}")
 
     # 6. 注册配置变更回调 - 热更新客户端
+    closing_tasks: set[asyncio.Task] = set()  # 被替换的旧搜索引擎的关闭任务
+
     def on_config_change(old_config: dict, new_config: dict):
         """Nacos配置变更时的处理逻辑"""
         logger.info("🔥 检测到Nacos配置变更,开始热更新客户端...")
@@ -74,25 +77,36 @@ async def lifespan(app: FastAPI):
             old_search = old_config.get("search", {})
             new_search = new_config.get("search", {})
             if old_search != new_search:
-                logger.info("🔄 搜索引擎配置变更,重新初始化...")
-                # 关闭旧客户端
-                if hasattr(app.state, "search_client"):
-                    import asyncio
-
-                    asyncio.create_task(app.state.search_client.close())
-                # 重新初始化
-                search_client = init_search_client(config)
-                app.state.search_client = search_client
-                logger.info("✅ 搜索引擎热更新完成")
+                search_client = getattr(app.state, "search_client", None)
+                if search_client is not None and search_client.reconfigure(config):
+                    # 连接配置未变,复用现有客户端和连接池
+                    logger.info("✅ 搜索引擎配置已更新(复用现有连接)")
+                else:
+                    logger.info("🔄 搜索引擎配置变更,重新初始化...")
+                    # 关闭旧客户端:close() 会等进行中的问答归还客户端,
+                    # 保留任务引用以免被回收,服务关闭时一并等待
+                    if search_client is not None:
+                        task = asyncio.create_task(search_client.close())
+                        closing_tasks.add(task)
+                        task.add_done_callback(closing_tasks.discard)
+                    # 重新初始化
+                    search_client = init_search_client(config)
+                    app.state.search_client = search_client
+                    logger.info("✅ 搜索引擎热更新完成")
 
             # 检查存储配置是否变更
             old_storage = old_config.get("storage", {})
             new_storage = new_config.get("storage", {})
             if old_storage != new_storage:
-                logger.info("🔄 存储配置变更,重新初始化...")
-                storage_client = init_storage_client(config)
-                app.state.storage_client = storage_client
-                logger.info("✅ 存储客户端热更新完成")
+                storage_client = getattr(app.state, "storage_client", None)
+                if storage_client is not None and storage_client.reconfigure(config):
+                    # 算子配置未变,复用现有算子
+                    logger.info("✅ 存储配置已更新(复用现有算子)")
+                else:
+                    logger.info("🔄 存储配置变更,重新初始化...")
+                    storage_client = init_storage_client(config)
+                    app.state.storage_client = storage_client
+                    logger.info("✅ 存储客户端热更新完成")
 
             # 检查LLM配置是否变更
             old_llm = old_config.get("llm", {})
@@ -125,6 +139,8 @@ async def lifespan(app: FastAPI):
 
     # 关闭搜索引擎连接
     try:
+        if closing_tasks:
+            await asyncio.gather(*closing_tasks, return_exceptions=True)
         if hasattr(app.state, "search_client"):
             await app.state.search_client.close()
     except Exception as e:
@@ -157,7 +173,7 @@ app.add_middleware(RequestLoggingMiddleware)
 
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
-    print("Validation error:", exc.errors())
+    logger.warning("Validation error: {}", exc.errors())
     return JSONResponse(
         status_code=422,
         content={"detail": exc.errors()},
@@ -5,7 +5,7 @@ from datetime import datetime
 from loguru import logger
 from sqlalchemy import Boolean, Column
 from sqlalchemy import Enum as SQLEnum
-from sqlalchemy import ForeignKey, Integer, String, Text, event, inspect
+from sqlalchemy import ForeignKey, Index, Integer, String, Text, event, inspect
 
 from database import Base
 
@@ -196,6 +196,11 @@ class Document(Base, ToDictMixin):
     upload_time = Column(Integer, default=lambda: int(time.time()), index=True)
     # 注意：status, error_message, processed_time, extracted_data 字段已移除，现在使用 template_document_mappings 表存储
 
+    # 文档列表按 (upload_time, id) 倒序做游标分页
+    __table_args__ = (
+        Index("ix_documents_upload_time_id", upload_time.desc(), id.desc()),
+    )
+
     @property
     def doc_metadata(self):
         """自动将 JSON 字符串转为 dict"""
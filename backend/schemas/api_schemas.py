@@ -42,10 +42,11 @@ class PaginationParams(BaseModel):
 class PaginatedResponse(BaseModel):
     """分页响应"""
 
-    total: int
-    page: int
+    total: Optional[int]  # 未统计总数时为 None
+    page: Optional[int]  # 游标分页时为 None
     page_size: int
     items: List[Any]
+    next_cursor: Optional[str] = None  # 游标分页时下一页的游标
 
 
 # ============= 用户相关 =============
@@ -1,3 +1,4 @@
+import asyncio
 from typing import Optional
 
 from loguru import logger
@@ -11,6 +12,7 @@ from utils.security import (
     create_access_token,
     create_refresh_token,
     get_password_hash,
+    password_needs_rehash,
     verify_password,
 )
 
@@ -31,9 +33,17 @@ class AuthService:
         if not user:
             return None
 
-        if not verify_password(password, user.hashed_password):
+        # Argon2 校验是 CPU 密集型操作，放到线程中执行，避免阻塞事件循环
+        if not await asyncio.to_thread(verify_password, password, user.hashed_password):
             return None
 
+        # 旧版 Fernet 密码在登录成功后迁移为 Argon2id 哈希
+        if password_needs_rehash(user.hashed_password):
+            user.hashed_password = await asyncio.to_thread(get_password_hash, password)
+            await db.commit()
+            await db.refresh(user)
+            logger.info(f"用户 {username} 的密码已重新哈希")
+
         return user
 
     @staticmethod
@@ -54,7 +64,7 @@ class AuthService:
         if result.scalar_one_or_none():
             raise ValueError("邮箱已被注册")
 
-        hashed_password = get_password_hash(user_data.password)
+        hashed_password = await asyncio.to_thread(get_password_hash, user_data.password)
 
         # 创建用户
         user = User(
@@ -1,4 +1,8 @@
+import asyncio
 import json
+import os
+import shutil
+import tempfile
 import time
 import uuid
 from datetime import datetime
@@ -6,7 +10,7 @@ from pathlib import Path
 from typing import Any, AsyncGenerator, BinaryIO, Dict, List, Optional
 
 from loguru import logger
-from sqlalchemy import select
+from sqlalchemy import and_, func, or_, select
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing_extensions import deprecated
 
@@ -116,6 +120,39 @@ TYPE_CLASSIFICATION_PROMPT = """
 {{doc}}
 """
 
+# 上传文件落盘解析时每次复制的块大小
+_SPOOL_CHUNK_SIZE = 1024 * 1024
+
+# 文件扩展名 -> MIME 类型
+_CONTENT_TYPES = {
+    ".pdf": "application/pdf",
+    ".docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    ".doc": "application/msword",
+    ".txt": "text/plain",
+    ".md": "text/markdown",
+    ".png": "image/png",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+}
+
+# 文档列表总数缓存：过滤条件 -> (过期时间, 总数)
+# 翻页期间总数基本不变，非首页请求直接复用，避免每页都执行一次 COUNT
+_COUNT_CACHE_TTL = 30
+_COUNT_CACHE_SIZE = 256
+_count_cache: Dict[tuple, tuple[float, int]] = {}
+
+
+def _invalidate_count_cache(document: Document) -> None:
+    """文档新增或删除后丢弃可能包含该文档的总数缓存
+
+    缓存键为 (template_id, status, user_id)，模板或上传者条件与文档不符的键不受影响
+    """
+    template_id = getattr(document, "template_id")
+    uploader_id = getattr(document, "uploader_id")
+    for key in list(_count_cache):
+        if key[0] in (None, template_id) and key[2] in (None, uploader_id):
+            del _count_cache[key]
+
 
 class DocumentService:
     """文档服务层"""
@@ -140,18 +177,13 @@ class DocumentService:
         file_extension = Path(filename).suffix
         object_name = f"{uuid.uuid4()}{file_extension}"
 
-        # 1️⃣ 读取文件内容（只读一次）
-        file_bytes = file_data.read()
-        if hasattr(file_data, "seek"):
-            file_data.seek(0)
-
         # 2️⃣ TODO 模拟上传（暂时没有实现上传到s3的逻辑）
         file_path = f"{object_name}"
         event.data = "[info] 上传文件成功"
         yield event.model_dump_json(ensure_ascii=False)
 
         # 3️⃣ 解析文本内容
-        doc = await DocumentParser.parse_file(file_bytes, file_extension)
+        doc, file_size = await DocumentService._parse_upload(file_data, file_extension)
 
         # 4️⃣ 获取模板
         template_id = document_data.template_id
@@ -412,7 +444,7 @@ class DocumentService:
             original_filename=filename,
             file_path=file_path,
             file_type=file_extension.lstrip("."),
-            file_size=len(file_bytes),
+            file_size=file_size,
             template_id=document_data.template_id,
             doc_metadata=document_data.metadata or {},
             uploader_id=user_id,
@@ -440,6 +472,7 @@ class DocumentService:
         db.add(mapping)
 
         await db.commit()
+        _invalidate_count_cache(document)
 
         # 将文档索引到Elasticsearch
         try:
@@ -447,25 +480,12 @@ class DocumentService:
 
             search_client = get_search_client()
 
-            # 获取upload_time的值
-            upload_time = getattr(document, "upload_time", None)
-
-            document_data_for_es = {
-                "document_id": document.id,
-                "title": document.title,
-                "content": doc,
-                "summary": ai_summary,  # 使用AI摘要代替简单截取
-                "template_id": document.template_id,
-                "file_type": document.file_type,
-                "upload_time": (
-                    datetime.fromtimestamp(upload_time).isoformat()
-                    if upload_time
-                    else None
-                ),
-                "metadata": _extracted_data,  # 将extracted_data存储在metadata字段中
-            }
-            await search_client.index_document(document_data_for_es)
-            logger.info(f"文档 {document.id} 已成功索引到Elasticsearch")
+            document_data_for_es = DocumentService._build_es_document(
+                document, doc, ai_summary, _extracted_data, mapping.class_code
+            )
+            # 只入队不等待写入，索引失败由批量写入协程记录日志
+            await search_client.index_document(document_data_for_es, wait=False)
+            logger.info(f"文档 {document.id} 已提交索引到Elasticsearch")
         except Exception as e:
             logger.error(f"文档 {document.id} 索引到Elasticsearch失败: {e}")
 
@@ -505,8 +525,8 @@ class DocumentService:
 
         object_name = f"{datetime.datetime.utcnow().strftime('%Y/%m/%d')}/{uuid.uuid4()}{file_extension}"
 
-        # 读取文件数据
-        file_bytes = file_data.read()
+        # 获取文件大小，不读取文件内容
+        file_size = file_data.seek(0, os.SEEK_END)
         file_data.seek(0)
 
         # 上传到对象存储
@@ -522,7 +542,7 @@ class DocumentService:
             original_filename=filename,
             file_path=file_path,
             file_type=file_extension.lstrip("."),
-            file_size=len(file_bytes),
+            file_size=file_size,
             template_id=document_data.template_id,
             doc_metadata=document_data.metadata or {},
             uploader_id=user_id,
@@ -531,12 +551,14 @@ class DocumentService:
         db.add(document)
         await db.commit()
         await db.refresh(document)
+        _invalidate_count_cache(document)
 
         # 异步解析文档（实际应该使用 Celery 任务队列）
         # REPLACE: 流式接口更好
         try:
+            file_data.seek(0)
             await DocumentService.parse_document(
-                db, int(getattr(document, "id")), file_bytes, file_extension
+                db, int(getattr(document, "id")), file_data, file_extension
             )
         except Exception as e:
             # 更新映射表中的错误信息
@@ -568,7 +590,7 @@ class DocumentService:
     async def parse_document(
         db: AsyncSession,
         document_id: int,
-        file_data: bytes,
+        file_data: BinaryIO,
         file_extension: str,
     ):
         """解析文档内容"""
@@ -589,7 +611,9 @@ class DocumentService:
 
         try:
             # 解析文本内容
-            content_text = await DocumentParser.parse_file(file_data, file_extension)
+            content_text, _ = await DocumentService._parse_upload(
+                file_data, file_extension
+            )
 
             # 提取元信息
             metadata = DocumentParser.extract_metadata(file_data, file_extension)
@@ -635,30 +659,68 @@ class DocumentService:
         template_id: Optional[int] = None,
         status: Optional[str] = None,
         user_id: Optional[int] = None,
-    ) -> tuple[list[Document], int]:
-        """获取文档列表"""
-        query = select(Document)
-        count_query = select(Document)
+        cursor: Optional[tuple[int, int]] = None,
+        include_total: bool = True,
+    ) -> tuple[list[Document], Optional[int]]:
+        """获取文档列表
 
-        if template_id:
-            query = query.where(Document.template_id == template_id)
-            count_query = count_query.where(Document.template_id == template_id)
+        cursor 为上一页最后一条记录的 (upload_time, id)，传入时按游标向后翻页并忽略 skip，
+        借助 (upload_time, id) 索引直接定位，深分页不再需要扫描并丢弃 skip 行
 
+        总数在首页重新统计，其余页在缓存有效期内复用；include_total=False 时不统计，返回 None
+        """
+        conditions = []
+        if template_id:
+            conditions.append(Document.template_id == template_id)
         if status:
-            query = query.where(Document.status == status)
-            count_query = count_query.where(Document.status == status)
-
+            conditions.append(Document.status == status)
         if user_id:
-            query = query.where(Document.uploader_id == user_id)
-            count_query = count_query.where(Document.uploader_id == user_id)
+            conditions.append(Document.uploader_id == user_id)
+
+        query = select(Document).where(*conditions)
+
+        if cursor:
+            upload_time, document_id = cursor
+            query = query.where(
+                or_(
+                    Document.upload_time < upload_time,
+                    and_(
+                        Document.upload_time == upload_time,
+                        Document.id < document_id,
+                    ),
+                )
+            )
+        else:
+            query = query.offset(skip)
 
-        query = query.order_by(Document.upload_time.desc()).offset(skip).limit(limit)
+        # id 作为第二排序键，保证 upload_time 相同的记录顺序稳定
+        query = query.order_by(Document.upload_time.desc(), Document.id.desc()).limit(
+            limit
+        )
 
         result = await db.execute(query)
         documents = result.scalars().all()
 
-        count_result = await db.execute(count_query)
-        total = len(count_result.scalars().all())
+        total = None
+        if include_total:
+            cache_key = (template_id, status, user_id)
+            now = time.monotonic()
+            cached = _count_cache.get(cache_key)
+            if cached and cached[0] > now and (cursor or skip):
+                total = cached[1]
+            else:
+                count_result = await db.execute(
+                    select(func.count()).select_from(Document).where(*conditions)
+                )
+                total = count_result.scalar_one()
+                _count_cache.pop(cache_key, None)
+                if len(_count_cache) >= _COUNT_CACHE_SIZE:
+                    # 先清理过期项，仍然满时淘汰最早写入的一项
+                    for key in [k for k, v in _count_cache.items() if v[0] <= now]:
+                        del _count_cache[key]
+                    if len(_count_cache) >= _COUNT_CACHE_SIZE:
+                        del _count_cache[next(iter(_count_cache))]
+                _count_cache[cache_key] = (now + _COUNT_CACHE_TTL, total)
 
         return list(documents), total
 
@@ -680,6 +742,8 @@ class DocumentService:
 
         await db.commit()
         await db.refresh(document)
+        if "status" in update_data:
+            _invalidate_count_cache(document)
         return document
 
     @staticmethod
@@ -699,6 +763,15 @@ class DocumentService:
         # 从数据库删除
         await db.delete(document)
         await db.commit()
+        _invalidate_count_cache(document)
+
+        # 从搜索索引删除，避免检索到已删除的文档
+        try:
+            from utils.search_engine import get_search_client
+
+            await get_search_client().delete_document(document_id, wait=False)
+        except Exception as e:
+            logger.error(f"文档 {document_id} 从Elasticsearch删除失败: {e}")
         return True
 
     @staticmethod
@@ -714,7 +787,22 @@ class DocumentService:
         file_path = getattr(document, "file_path")
         object_name = file_path.split("/", 1)[1] if "/" in file_path else file_path
 
-        return storage_client.get_presigned_url(object_name)
+        url = await storage_client.get_presigned_url(object_name)
+        # 后端不支持预签名时由后端 API 按文档 ID 流式提供文件
+        return url or f"/api/v1/documents/{document_id}/file"
+
+    @staticmethod
+    async def get_file_object(
+        db: AsyncSession, document_id: int
+    ) -> Optional[tuple[Document, str]]:
+        """获取文档及其在对象存储中的对象名，文档不存在时返回 None"""
+        document = await DocumentService.get_document(db, document_id)
+        if not document:
+            return None
+
+        file_path = getattr(document, "file_path")
+        object_name = file_path.split("/", 1)[1] if "/" in file_path else file_path
+        return document, object_name
 
     @staticmethod
     async def create_document_manually(
@@ -754,11 +842,6 @@ class DocumentService:
         file_extension = Path(filename).suffix
         object_name = f"{uuid.uuid4()}{file_extension}"
 
-        # 1️⃣ 读取文件内容
-        file_bytes = file_data.read()
-        if hasattr(file_data, "seek"):
-            file_data.seek(0)
-
         # 2️⃣ 模拟上传（暂时没有实现上传到s3的逻辑）
         file_path = f"{object_name}"
         event.data = "[info] 上传文件成功"
@@ -767,7 +850,7 @@ class DocumentService:
         # 3️⃣ 解析文本内容
         event.data = "[info] 解析文档内容中..."
         yield event.model_dump_json(ensure_ascii=False)
-        doc = await DocumentParser.parse_file(file_bytes, file_extension)
+        doc, file_size = await DocumentService._parse_upload(file_data, file_extension)
 
         # 4️⃣ 如果没有提供标题，使用文件名
         if not title:
@@ -885,7 +968,7 @@ class DocumentService:
             original_filename=filename,
             file_path=file_path,
             file_type=file_extension.lstrip("."),
-            file_size=len(file_bytes),
+            file_size=file_size,
             template_id=template_id,
             doc_metadata={},
             uploader_id=user_id,
@@ -913,6 +996,7 @@ class DocumentService:
         db.add(mapping)
 
         await db.commit()
+        _invalidate_count_cache(document)
 
         # 8️⃣ 将文档索引到Elasticsearch
         event.data = "[info] 索引文档到搜索引擎..."
@@ -923,26 +1007,13 @@ class DocumentService:
 
             search_client = get_search_client()
 
-            # 获取upload_time的值
-            upload_time = getattr(document, "upload_time", None)
-
-            document_data_for_es = {
-                "document_id": document.id,
-                "title": document.title,
-                "content": doc,
-                "summary": ai_summary,  # 使用AI摘要
-                "template_id": document.template_id,
-                "file_type": document.file_type,
-                "upload_time": (
-                    datetime.fromtimestamp(upload_time).isoformat()
-                    if upload_time
-                    else None
-                ),
-                "metadata": _extracted_data,  # 将extracted_data存储在metadata字段中
-            }
-            await search_client.index_document(document_data_for_es)
-            logger.info(f"文档 {document.id} 已成功索引到Elasticsearch")
-            event.data = "[info] 文档索引成功"
+            document_data_for_es = DocumentService._build_es_document(
+                document, doc, ai_summary, _extracted_data, mapping.class_code
+            )
+            # 只入队不等待写入，索引失败由批量写入协程记录日志
+            await search_client.index_document(document_data_for_es, wait=False)
+            logger.info(f"文档 {document.id} 已提交索引到Elasticsearch")
+            event.data = "[info] 文档已提交索引"
             yield event.model_dump_json(ensure_ascii=False)
         except Exception as e:
             logger.error(f"文档 {document.id} 索引到Elasticsearch失败: {e}")
@@ -1061,6 +1132,16 @@ class DocumentService:
         logger.info(
             f"文档 {document_id} 的分类编码已更新: {original_code} -> {final_code}"
         )
+
+        # 同步更新搜索索引中的分类编码，保证按分类过滤和检索结果中的编码一致
+        try:
+            from utils.search_engine import get_search_client
+
+            await get_search_client().update_document(
+                document_id, {"class_code": final_code}, wait=False
+            )
+        except Exception as e:
+            logger.error(f"文档 {document_id} 的分类编码同步到Elasticsearch失败: {e}")
         return True
 
     @staticmethod
@@ -1138,17 +1219,59 @@ class DocumentService:
             "level_options": level_options,
         }
 
+    @staticmethod
+    async def _parse_upload(
+        file_data: BinaryIO, file_extension: str
+    ) -> tuple[str, int]:
+        """将上传的文件流落盘到临时文件后按路径解析
+
+        按块复制到磁盘，解析时由 PDFium/zipfile 直接读取文件，
+        整个文件不会以 bytes 形式驻留在进程堆中
+
+        Returns:
+            (解析后的文本内容, 文件大小)
+        """
+        fd, tmp_path = tempfile.mkstemp(suffix=file_extension)
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                file_data.seek(0)
+                await asyncio.to_thread(
+                    shutil.copyfileobj, file_data, tmp, _SPOOL_CHUNK_SIZE
+                )
+                file_size = tmp.tell()
+            file_data.seek(0)
+            text = await DocumentParser.parse_file_path(tmp_path, file_extension)
+            return text, file_size
+        finally:
+            os.unlink(tmp_path)
+
+    @staticmethod
+    def _build_es_document(
+        document: Document,
+        content: str,
+        summary: Optional[str],
+        extracted_data: Optional[Dict[str, Any]],
+        class_code: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """构造写入 Elasticsearch 的文档数据"""
+        # 获取upload_time的值
+        upload_time = getattr(document, "upload_time", None)
+
+        return {
+            "document_id": document.id,
+            "title": document.title,
+            "content": content,
+            "summary": summary,  # 使用AI摘要代替简单截取
+            "template_id": document.template_id,
+            "file_type": document.file_type,
+            "class_code": class_code,
+            "upload_time": (
+                datetime.fromtimestamp(upload_time).isoformat() if upload_time else None
+            ),
+            "metadata": extracted_data,  # 将extracted_data存储在metadata字段中
+        }
+
     @staticmethod
     def _get_content_type(file_extension: str) -> str:
         """获取文件 MIME 类型"""
-        content_types = {
-            ".pdf": "application/pdf",
-            ".docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-            ".doc": "application/msword",
-            ".txt": "text/plain",
-            ".md": "text/markdown",
-            ".png": "image/png",
-            ".jpg": "image/jpeg",
-            ".jpeg": "image/jpeg",
-        }
-        return content_types.get(file_extension.lower(), "application/octet-stream")
+        return _CONTENT_TYPES.get(file_extension.lower(), "application/octet-stream")
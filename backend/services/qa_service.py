@@ -39,6 +39,7 @@ class QAService:
             template_id=template_id,
             page=1,
             page_size=top_k,
+            include_total=False,
         )
 
         # 获取文档详细信息
@@ -47,16 +48,24 @@ class QAService:
         if not document_ids:
             return []
 
-        result = await db.execute(select(Document).where(Document.id.in_(document_ids)))
-        documents = result.scalars().all()
+        # 只查询组装上下文需要的列
+        result = await db.execute(
+            select(
+                Document.id,
+                Document.title,
+                Document.ai_summary,
+                Document.content_text,
+            ).where(Document.id.in_(document_ids))
+        )
+        documents = result.all()
 
         # 组装文档信息
         retrieved_docs = []
         for doc in documents:
             # 提取文档片段（这里简化处理，实际可以根据相关性提取更精准的片段）
             snippet = ""
-            if doc.summary:
-                snippet = doc.summary[:300]  # 取摘要的前300字符
+            if doc.ai_summary:
+                snippet = doc.ai_summary[:300]  # 取摘要的前300字符
             elif doc.content_text:
                 snippet = doc.content_text[:300]  # 取内容的前300字符
             else:
@@ -188,14 +197,14 @@ class QAService:
             prompt = QAService._build_qa_prompt(question, retrieved_docs)
 
             # 6. 流式生成答案
-            stream = llm_client.client.chat.completions.create(
+            stream = await llm_client.client.chat.completions.create(
                 model=llm_client.default_model,
                 messages=[{"role": "user", "content": prompt}],
                 temperature=0.7,
                 stream=True,
             )
 
-            for chunk in stream:
+            async for chunk in stream:
                 if chunk.choices[0].delta.content:
                     yield {
                         "event": "answer",
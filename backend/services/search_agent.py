@@ -1,5 +1,6 @@
 import asyncio
 import hashlib
+import heapq
 import json
 import re
 from difflib import SequenceMatcher
@@ -12,6 +13,7 @@ from langgraph.graph.state import CompiledStateGraph
 from loguru import logger
 from sqlalchemy import or_, select
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only
 
 from models.database_models import (
     Document,
@@ -27,6 +29,9 @@ from utils.llm_client import get_llm_client
 # 注意: 生产环境应使用 Redis 等分布式缓存替代内存存储
 graph_state_storage: Dict[str, Dict[str, Any]] = {}
 
+# 结果融合后保留的文档数量
+MAX_MERGED_DOCUMENTS = 10
+
 
 # ==================== 文档去重工具函数 ====================
 
@@ -791,6 +796,18 @@ async def merge_retrieval_results(
     es_ids = state.get("es_document_ids", set())
     sql_ids = state.get("sql_document_ids", set())
 
+    # ES 召回结果按相关度排列，记录名次用于在各集合中挑选排名最高的文档
+    es_rank = {
+        doc["document_id"]: rank
+        for rank, doc in enumerate(state.get("es_fulltext_results", []))
+    }
+
+    def top_by_es_rank(ids: Set[int]) -> List[int]:
+        # 只需要前 K 篇，用有界堆代替整体排序
+        return heapq.nsmallest(
+            MAX_MERGED_DOCUMENTS, ids, key=lambda i: es_rank.get(i, len(es_rank))
+        )
+
     logger.info(f"📊 ES 召回: {len(es_ids)} 篇, SQL 召回: {len(sql_ids)} 篇")
 
     # 决定融合策略
@@ -806,7 +823,7 @@ async def merge_retrieval_results(
         # 只有 ES 召回了
         logger.info("📌 策略: ES为主 (SQL未召回)")
         state["fusion_strategy"] = "es_only"
-        merged_ids = list(es_ids)
+        merged_ids = top_by_es_rank(es_ids)
 
     elif not es_ids:
         # 只有 SQL 召回了
@@ -823,33 +840,43 @@ async def merge_retrieval_results(
             # 交集足够多,使用交集 (高精度)
             logger.info(f"📌 策略: 交集 (共 {len(intersection)} 篇文档)")
             state["fusion_strategy"] = "intersection"
-            merged_ids = list(intersection)
+            merged_ids = top_by_es_rank(intersection)
 
         elif len(intersection) > 0:
             # 交集较少,ES为主,SQL为辅
             logger.info(f"📌 策略: ES为主,SQL辅助 (交集 {len(intersection)} 篇)")
             state["fusion_strategy"] = "es_primary"
             # ES 结果在前,交集优先,然后是 ES 独有
-            merged_ids = list(intersection) + [
-                id for id in es_ids if id not in intersection
-            ]
+            merged_ids = top_by_es_rank(intersection) + top_by_es_rank(
+                es_ids - intersection
+            )
 
         else:
             # 没有交集,取并集
             logger.info(f"📌 策略: 并集 (ES {len(es_ids)} + SQL {len(sql_ids)})")
             state["fusion_strategy"] = "union"
-            merged_ids = list(es_ids) + \
+            merged_ids = top_by_es_rank(es_ids) + \
                 [id for id in sql_ids if id not in es_ids]
 
-    # 限制结果数量 (Top 10)
-    merged_ids = merged_ids[:10]
+    # 限制结果数量
+    merged_ids = merged_ids[:MAX_MERGED_DOCUMENTS]
     state["merged_document_ids"] = merged_ids
 
     # 从数据库加载文档对象
     if merged_ids:
         try:
+            # 后续节点只用到这几列，其余列不加载
             docs_result = await db.execute(
-                select(Document).where(Document.id.in_(merged_ids))
+                select(Document)
+                .options(
+                    load_only(
+                        Document.id,
+                        Document.title,
+                        Document.content_text,
+                        Document._doc_metadata,
+                    )
+                )
+                .where(Document.id.in_(merged_ids))
             )
             docs = list(docs_result.scalars().all())
 
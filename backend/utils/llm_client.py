@@ -4,14 +4,17 @@ from contextlib import asynccontextmanager
 from typing import Any, Dict, List, Optional
 
 from loguru import logger
-from openai import OpenAI
+from openai import AsyncOpenAI
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from config import DynamicConfig
 
 
 class LLMClient:
-    """大语言模型客户端（同步版）"""
+    """大语言模型客户端（异步版）
+
+    使用 AsyncOpenAI，模型调用期间不阻塞事件循环
+    """
 
     def __init__(self, config: DynamicConfig):
         """
@@ -25,12 +28,12 @@ class LLMClient:
 
         # 自动根据 provider 初始化兼容 openai 的客户端
         if self.provider == "openai":
-            self.client = OpenAI(
+            self.client = AsyncOpenAI(
                 api_key=config.OPENAI_API_KEY,
                 base_url=config.OPENAI_BASE_URL.rstrip("/"),
             )
         elif self.provider == "deepseek":
-            self.client = OpenAI(
+            self.client = AsyncOpenAI(
                 api_key=config.DEEPSEEK_API_KEY,
                 base_url=config.DEEPSEEK_BASE_URL.rstrip("/"),
             )
@@ -78,7 +81,7 @@ class LLMClient:
             db.add(log)
             await db.commit()
         except Exception as e:
-            print(f"Failed to log LLM call: {e}")
+            logger.error("Failed to log LLM call: {}", e)
             # 不影响主流程
             pass
 
@@ -111,7 +114,7 @@ class LLMClient:
 
         start_time = time.time()
         try:
-            response = self.client.chat.completions.create(
+            response = await self.client.chat.completions.create(
                 model=model,
                 messages=messages,  # type: ignore
                 temperature=temperature,
@@ -1,52 +1,182 @@
+import asyncio
+import hashlib
 import io
+import mmap
+import multiprocessing
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
-from typing import Optional
+from typing import BinaryIO, List, Optional, Union
 
-import docx
-import PyPDF2
-from PIL import Image
+from charset_normalizer import from_bytes
+
+# docx / pypdfium2 在对应的解析方法中按需导入，
+# 只处理文本文件的进程无需承担加载这些库的开销
+
+# 编码探测所需的最小字节数，更短的内容探测结果不可靠
+_MIN_DETECT_LENGTH = 64
+
+# 解析结果缓存：(内容哈希, 扩展名) -> 文本，按 LRU 淘汰
+_PARSE_CACHE_SIZE = 128
+_parse_cache: "OrderedDict[tuple[bytes, str], str]" = OrderedDict()
+
+# PDF 文本提取是 CPU 密集型操作，放到进程池中按页并行执行
+# (PDFium 不是线程安全的，因此使用进程而不是线程)
+_PDF_WORKERS = os.cpu_count() or 1
+
+
+def _create_pdf_pool() -> ProcessPoolExecutor:
+    """创建 PDF 解析进程池
+
+    主进程中已有 OpenDAL/Tokio 及 to_thread 的工作线程，fork 会复制这些线程持有的锁状态，
+    因此子进程通过 forkserver（不支持时用 spawn）启动
+    """
+    method = (
+        "forkserver"
+        if "forkserver" in multiprocessing.get_all_start_methods()
+        else "spawn"
+    )
+    return ProcessPoolExecutor(
+        max_workers=_PDF_WORKERS, mp_context=multiprocessing.get_context(method)
+    )
+
+
+_pdf_pool = _create_pdf_pool()
+
+
+def _reset_pdf_pool(broken: ProcessPoolExecutor) -> None:
+    """子进程异常退出（如 PDFium 崩溃、被 OOM kill）后进程池不再可用，重建进程池"""
+    global _pdf_pool
+    if _pdf_pool is broken:
+        broken.shutdown(wait=False, cancel_futures=True)
+        _pdf_pool = _create_pdf_pool()
+
+
+# 文件内容可以是内存中的 bytes，也可以是已打开的、可 seek 的二进制文件对象
+FileData = Union[bytes, BinaryIO]
+
+
+def _extract_pages(file_data: Union[bytes, str], start: int, stop: int) -> List[str]:
+    """在子进程中提取 [start, stop) 范围内各页的文本
+
+    每个子进程自行打开 PDF，避免跨进程传递 PDFium 的原生对象；
+    传入文件路径时由 PDFium 直接读取文件，无需把整个文件序列化给子进程
+    """
+    import pypdfium2 as pdfium
+
+    pdf = pdfium.PdfDocument(file_data)
+    try:
+        texts = []
+        for i in range(start, stop):
+            page = pdf[i]
+            textpage = page.get_textpage()
+            texts.append(textpage.get_text_bounded())
+            textpage.close()
+            page.close()
+        return texts
+    finally:
+        pdf.close()
+
+
+def _count_pages(file_data: Union[bytes, str]) -> int:
+    """在子进程中获取 PDF 页数"""
+    import pypdfium2 as pdfium
+
+    pdf = pdfium.PdfDocument(file_data)
+    try:
+        return len(pdf)
+    finally:
+        pdf.close()
+
+
+def _as_stream(file_data: FileData) -> BinaryIO:
+    """bytes 包装为 BytesIO；文件对象从头开始直接使用"""
+    if isinstance(file_data, bytes):
+        return io.BytesIO(file_data)
+    file_data.seek(0)
+    return file_data
+
+
+def _data_size(file_data: FileData) -> int:
+    """bytes 直接取长度，文件对象通过 seek 到末尾获取大小"""
+    try:
+        return len(file_data)
+    except TypeError:
+        size = file_data.seek(0, io.SEEK_END)
+        file_data.seek(0)
+        return size
 
 
 class DocumentParser:
     """文档解析器"""
 
     @staticmethod
-    async def parse_pdf(file_data: bytes) -> str:
-        """解析 PDF 文件"""
+    async def parse_pdf(file_data: Union[bytes, str]) -> str:
+        """解析 PDF 文件
+
+        Args:
+            file_data: 文件二进制数据或本地文件路径
+        """
+        pool = _pdf_pool
         try:
-            pdf_file = io.BytesIO(file_data)
-            pdf_reader = PyPDF2.PdfReader(pdf_file)
+            # 打开 PDF 读取页数也会解析交叉引用表，同样放到子进程中，不阻塞事件循环
+            loop = asyncio.get_running_loop()
+            page_count = await loop.run_in_executor(pool, _count_pages, file_data)
+            if page_count == 0:
+                return ""
 
-            text_content = []
-            for page in pdf_reader.pages:
-                text = page.extract_text()
-                if text:
-                    text_content.append(text)
+            # 将页面划分为连续区间，每个区间交给一个子进程处理
+            step = -(-page_count // min(page_count, _PDF_WORKERS))
+            chunks = await asyncio.gather(
+                *[
+                    loop.run_in_executor(
+                        pool,
+                        _extract_pages,
+                        file_data,
+                        start,
+                        min(start + step, page_count),
+                    )
+                    for start in range(0, page_count, step)
+                ]
+            )
 
+            text_content = [text for chunk in chunks for text in chunk if text]
             return "\n".join(text_content)
+        except BrokenProcessPool as e:
+            # 本次解析失败，但重建进程池，后续的解析请求不受影响
+            _reset_pdf_pool(pool)
+            raise Exception(f"PDF 解析失败: 解析进程异常退出 ({e})")
         except Exception as e:
             raise Exception(f"PDF 解析失败: {str(e)}")
 
     @staticmethod
-    async def parse_docx(file_data: bytes) -> str:
+    async def parse_docx(file_data: FileData) -> str:
         """解析 DOCX 文件"""
+        import docx
+
         try:
-            doc_file = io.BytesIO(file_data)
-            doc = docx.Document(doc_file)
+            doc = docx.Document(_as_stream(file_data))
 
-            text_content = []
+            # paragraph.text / cell.text 每次访问都会重新拼接 run，只取一次
+            buf = io.StringIO()
             for paragraph in doc.paragraphs:
-                if paragraph.text.strip():
-                    text_content.append(paragraph.text)
+                text = paragraph.text
+                if text and not text.isspace():
+                    buf.write(text)
+                    buf.write("\n")
 
             # 提取表格内容
             for table in doc.tables:
                 for row in table.rows:
-                    row_text = " | ".join(cell.text.strip() for cell in row.cells)
+                    row_text = " | ".join(map(str.strip, (c.text for c in row.cells)))
                     if row_text:
-                        text_content.append(row_text)
+                        buf.write(row_text)
+                        buf.write("\n")
 
-            return "\n".join(text_content)
+            # 去掉最后一行多写入的换行符
+            return buf.getvalue()[:-1]
         except Exception as e:
             raise Exception(f"DOCX 解析失败: {str(e)}")
 
@@ -54,17 +184,26 @@ class DocumentParser:
     async def parse_txt(file_data: bytes, encoding: str = "utf-8") -> str:
         """解析文本文件"""
         try:
-            # 尝试多种编码
-            encodings = [encoding, "utf-8", "gbk", "gb2312", "latin-1"]
+            # 优先按指定编码解码
+            try:
+                return file_data.decode(encoding)
+            except UnicodeDecodeError:
+                pass
 
-            for enc in encodings:
-                try:
-                    return file_data.decode(enc)
-                except UnicodeDecodeError:
-                    continue
+            # 其余编码交给探测；内容太短时探测结果不可靠，不予采用
+            if len(file_data) >= _MIN_DETECT_LENGTH:
+                result = from_bytes(file_data).best()
+                if result is not None:
+                    return str(result)
 
-            # 如果都失败，使用默认编码并忽略错误
-            return file_data.decode("utf-8", errors="ignore")
+            # 探测不出时再尝试中文文本常见的 GB18030（兼容 GBK/GB2312）
+            try:
+                return file_data.decode("gb18030")
+            except UnicodeDecodeError:
+                pass
+
+            # 如果都失败，按 latin-1 解码（任意字节都能解码，不会丢失内容）
+            return file_data.decode("latin-1")
         except Exception as e:
             raise Exception(f"文本文件解析失败: {str(e)}")
 
@@ -87,22 +226,81 @@ class DocumentParser:
         """
         ext = file_extension.lower().lstrip(".")
 
-        if ext == "pdf":
-            return await DocumentParser.parse_pdf(file_data)
-        elif ext in ["docx", "doc"]:
-            return await DocumentParser.parse_docx(file_data)
-        elif ext in ["txt", "md", "markdown"]:
-            return await DocumentParser.parse_txt(file_data)
-        elif ext in ["png", "jpg", "jpeg", "bmp", "tiff"]:
-            return await DocumentParser.parse_image_ocr(file_data)
-        else:
+        # 相同内容(重复上传、重建索引)直接复用上次的解析结果
+        cache_key = (hashlib.blake2b(file_data, digest_size=16).digest(), ext)
+        text = _parse_cache.get(cache_key)
+        if text is not None:
+            _parse_cache.move_to_end(cache_key)
+            return text
+
+        text = await DocumentParser._parse_by_extension(file_data, ext)
+
+        _parse_cache[cache_key] = text
+        if len(_parse_cache) > _PARSE_CACHE_SIZE:
+            _parse_cache.popitem(last=False)
+        return text
+
+    @staticmethod
+    async def parse_file_path(
+        path: Union[str, os.PathLike], file_extension: Optional[str] = None
+    ) -> str:
+        """
+        解析本地文件
+
+        文件以只读方式 mmap 映射后计算内容哈希；PDF 把路径交给子进程由
+        PDFium 自行打开，DOCX 直接从文件对象按需读取 zip 成员，
+        整个文件不会被读入进程堆
+
+        Args:
+            path: 本地文件路径
+            file_extension: 文件扩展名，默认取路径的后缀
+
+        Returns:
+            解析后的文本内容
+        """
+        ext = (file_extension or Path(path).suffix).lower().lstrip(".")
+
+        with open(path, "rb") as f:
+            # 空文件无法 mmap，直接走内存解析
+            if os.fstat(f.fileno()).st_size == 0:
+                return await DocumentParser.parse_file(b"", ext)
+
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                cache_key = (hashlib.blake2b(mm, digest_size=16).digest(), ext)
+                text = _parse_cache.get(cache_key)
+                if text is not None:
+                    _parse_cache.move_to_end(cache_key)
+                    return text
+
+                if ext == "pdf":
+                    text = await DocumentParser.parse_pdf(os.fspath(path))
+                elif ext in ["docx", "doc"]:
+                    text = await DocumentParser.parse_docx(f)
+                else:
+                    # 文本解码需要 bytes，这里才复制一次
+                    text = await DocumentParser._parse_by_extension(mm[:], ext)
+
+        _parse_cache[cache_key] = text
+        if len(_parse_cache) > _PARSE_CACHE_SIZE:
+            _parse_cache.popitem(last=False)
+        return text
+
+    @staticmethod
+    async def _parse_by_extension(file_data: bytes, ext: str) -> str:
+        """按扩展名(不含点号)分发到具体的解析方法"""
+        parser = _PARSERS_BY_EXTENSION.get(ext)
+        if parser is None:
             raise ValueError(f"不支持的文件格式: {ext}")
+        return await parser(file_data)
 
     @staticmethod
-    def extract_metadata(file_data: bytes, file_extension: str) -> dict:
-        """提取文件元信息"""
+    def extract_metadata(file_data: FileData, file_extension: str) -> dict:
+        """提取文件元信息
+
+        file_data 为文件对象时，文件大小通过 seek 到末尾获取
+        """
         metadata = {
-            "file_size": len(file_data),
+            "file_size": _data_size(file_data),
             "file_type": file_extension,
         }
 
@@ -110,21 +308,30 @@ class DocumentParser:
             ext = file_extension.lower().lstrip(".")
 
             if ext == "pdf":
-                pdf_file = io.BytesIO(file_data)
-                pdf_reader = PyPDF2.PdfReader(pdf_file)
+                import pypdfium2 as pdfium
 
-                metadata.update(
-                    {
-                        "pages": len(pdf_reader.pages),
-                        "pdf_metadata": (
-                            pdf_reader.metadata if pdf_reader.metadata else {}
-                        ),
-                    }
-                )
+                # 只读取页数和 /Info 字典，不加载页面内容流
+                pdf = pdfium.PdfDocument(_as_stream(file_data))
+                try:
+                    metadata.update(
+                        {
+                            "pages": len(pdf),
+                            # 键名保持 PDF 原始的 "/Title" 形式
+                            "pdf_metadata": {
+                                f"/{k}": v
+                                for k, v in pdf.get_metadata_dict(
+                                    skip_empty=True
+                                ).items()
+                            },
+                        }
+                    )
+                finally:
+                    pdf.close()
 
             elif ext in ["docx", "doc"]:
-                doc_file = io.BytesIO(file_data)
-                doc = docx.Document(doc_file)
+                import docx
+
+                doc = docx.Document(_as_stream(file_data))
 
                 core_props = doc.core_properties
                 metadata.update(
@@ -144,3 +351,19 @@ class DocumentParser:
             metadata["metadata_error"] = str(e)
 
         return metadata
+
+
+# 扩展名(不含点号) -> 解析方法，模块加载时构造一次，解析时直接查表分发
+_PARSERS_BY_EXTENSION = {
+    "pdf": DocumentParser.parse_pdf,
+    "docx": DocumentParser.parse_docx,
+    "doc": DocumentParser.parse_docx,
+    "txt": DocumentParser.parse_txt,
+    "md": DocumentParser.parse_txt,
+    "markdown": DocumentParser.parse_txt,
+    "png": DocumentParser.parse_image_ocr,
+    "jpg": DocumentParser.parse_image_ocr,
+    "jpeg": DocumentParser.parse_image_ocr,
+    "bmp": DocumentParser.parse_image_ocr,
+    "tiff": DocumentParser.parse_image_ocr,
+}
@@ -2,10 +2,14 @@
 搜索引擎 - Elasticsearch
 """
 
+import asyncio
+import operator
+from contextlib import suppress
 from datetime import datetime
 from typing import Any, Dict, List, Optional
 
 from elasticsearch import AsyncElasticsearch
+from elasticsearch.serializer import OrjsonSerializer
 from loguru import logger
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -13,6 +17,108 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from config import DynamicConfig
 from models.database_models import TemplateDocumentMapping
 
+# 批量索引参数：单批最多合并的文档数、单批文本量上限（字符）、等待凑批的最长时间（秒）
+BULK_MAX_BATCH = 500
+BULK_MAX_CHARS = 10 * 1024 * 1024
+BULK_MAX_WAIT = 0.05
+# 关闭时等待借出的客户端归还的最长时间（秒），超时后强制关闭
+CLOSE_GRACE_PERIOD = 60
+# 连接池在批量写入并发数之外为检索请求预留的连接数(elastic-transport 默认值)
+SEARCH_CONNECTIONS = 10
+
+# 搜索结果只使用以下字段：_source 在分片上裁剪，filter_path 再去掉响应中的其余元数据
+_SEARCH_SOURCE_FIELDS = ["document_id", "title", "summary", "class_code"]
+_SEARCH_FILTER_PATH = [
+    "hits.total.value",
+    "hits.hits._source",
+    "hits.hits._score",
+    "hits.hits.sort",
+]
+_MSEARCH_FILTER_PATH = [f"responses.{path}" for path in _SEARCH_FILTER_PATH] + [
+    "responses.error"
+]
+# 查询中固定不变的部分，在模块加载时构造一次
+_KEYWORD_FIELDS = ["title^3", "content", "summary^2"]
+_MATCH_ALL = {"match_all": {}}
+# document_id 作为 upload_time 相同时的决胜字段，保证 search_after 游标唯一
+_SEARCH_SORT = [
+    {"upload_time": {"order": "desc"}},
+    {"document_id": {"order": "desc"}},
+]
+# 有关键词时按相关度排序，相关度相同时再按时间倒序
+_RELEVANCE_SORT = [{"_score": {"order": "desc"}}] + _SEARCH_SORT
+# 临近度加分：关键词各词项在原文中相距越近（slop 范围内）得分越高
+PROXIMITY_SLOP = 10
+PROXIMITY_BOOST = 0.5
+_SRC_GET = operator.itemgetter("_source", "_score")
+
+
+# _bulk 队列中的一项：(操作行, 文档内容(删除时为 None), 调用方等待的结果)
+_BulkItem = tuple[Dict[str, Any], Optional[Dict[str, Any]], asyncio.Future]
+
+
+def _text_size(document_data: Optional[Dict[str, Any]]) -> int:
+    """估算文档的文本量，用于限制单个 _bulk 请求体的大小"""
+    if document_data is None:
+        return 0
+    return sum(len(v) for v in document_data.values() if isinstance(v, str))
+
+
+def _date_filter(
+    start: Optional[datetime], end: Optional[datetime]
+) -> Optional[Dict[str, Any]]:
+    """构造 upload_time 的范围过滤条件，两端都未指定时返回 None"""
+    if start is None and end is None:
+        return None
+
+    date_range = {}
+    if start is not None:
+        date_range["gte"] = start.isoformat()
+    if end is not None:
+        date_range["lte"] = end.isoformat()
+    return {"range": {"upload_time": date_range}}
+
+
+def _class_code_filter(class_code: str) -> Dict[str, Any]:
+    """匹配指定分类编码及其下级编码（编码各层级以 "-" 连接）
+
+    在 keyword 字段上用一个复合过滤代替逐层的 term 条件
+    """
+    return {
+        "bool": {
+            "should": [
+                {"term": {"class_code": class_code}},
+                {"prefix": {"class_code": f"{class_code}-"}},
+            ],
+            "minimum_should_match": 1,
+        }
+    }
+
+
+def _create_es_client(config: DynamicConfig) -> AsyncElasticsearch:
+    """创建 Elasticsearch 客户端
+
+    整个进程共用该客户端的连接池（搜索、索引以及智能体问答）；
+    开启 gzip 压缩以减少批量写入和检索结果的传输量，
+    并使用 orjson 代替标准库 json 进行请求/响应的序列化。
+    连接池大小按批量写入并发数放大，避免并发 _bulk 请求排队等待连接
+    """
+    return AsyncElasticsearch(
+        [config.ELASTICSEARCH_URL],
+        serializer=OrjsonSerializer(),
+        verify_certs=False,
+        connections_per_node=config.ELASTICSEARCH_BULK_CONCURRENCY + SEARCH_CONNECTIONS,
+        http_compress=True,
+        request_timeout=30,
+        max_retries=3,
+        retry_on_timeout=True,
+    )
+
+
+def _connection_key(config: DynamicConfig) -> tuple:
+    """影响 Elasticsearch 客户端连接的配置项"""
+    return (config.ELASTICSEARCH_URL, config.ELASTICSEARCH_BULK_CONCURRENCY)
+
 
 class SearchEngine:
     """Elasticsearch 搜索引擎"""
@@ -24,10 +130,52 @@ class SearchEngine:
         Args:
             config: 动态配置实例
         """
-        self.client = AsyncElasticsearch([config.ELASTICSEARCH_URL], verify_certs=False)
+        self.client = _create_es_client(config)
         self.index_name = config.ELASTICSEARCH_INDEX
+        # 决定连接池的配置项，变更时才需要重建客户端
+        self._connection_key = _connection_key(config)
+
+        # 索引/删除请求队列，由后台协程合并为 _bulk 请求
+        self._queue: asyncio.Queue[_BulkItem] = asyncio.Queue()
+        self._flusher_task: Optional[asyncio.Task] = None
+        # 限制同时进行的 _bulk 请求数
+        self._bulk_slots = asyncio.Semaphore(config.ELASTICSEARCH_BULK_CONCURRENCY)
+        self._inflight: set[asyncio.Task] = set()
+        # 已入队但尚未得到结果的请求，供 flush() 等待
+        self._pending: set[asyncio.Future] = set()
+        # 借出的客户端数量（问答 SSE 流整个生命周期持有客户端），归零时 _idle 置位
+        self._leases = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
         logger.info(f"✅ Elasticsearch 搜索引擎初始化完成: {config.ELASTICSEARCH_URL}")
 
+    def reconfigure(self, config: DynamicConfig) -> bool:
+        """应用新的搜索配置
+
+        连接相关配置未变化时（如只修改了索引名）直接复用现有客户端和连接池，
+        避免重新建连；返回 False 表示连接配置已变化，需要重新创建搜索引擎
+        """
+        if _connection_key(config) != self._connection_key:
+            return False
+        self.index_name = config.ELASTICSEARCH_INDEX
+        return True
+
+    def acquire(self) -> AsyncElasticsearch:
+        """借出底层客户端，用完必须调用 release() 归还
+
+        热更新替换搜索引擎后，旧实例的 close() 会等所有借出的客户端归还再关闭连接，
+        进行中的问答流不会因配置变更被中断
+        """
+        self._leases += 1
+        self._idle.clear()
+        return self.client
+
+    def release(self):
+        """归还 acquire() 借出的客户端"""
+        self._leases -= 1
+        if self._leases == 0:
+            self._idle.set()
+
     async def ensure_index(self):
         """确保索引存在"""
         if not await self.client.indices.exists(index=self.index_name):
@@ -53,69 +201,279 @@ class SearchEngine:
                     },
                     "template_id": {"type": "keyword"},
                     "file_type": {"type": "keyword"},
+                    "class_code": {"type": "keyword"},
                     "upload_time": {"type": "date"},
                     "metadata": {"type": "object", "dynamic": True},  # 动态元数据区域
                 },
-            }
+            },
         }
         await self.client.indices.create(index=self.index_name, body=index_mapping)
 
-    async def index_document(self, document_data: Dict[str, Any]) -> bool:
-        """索引文档"""
+    async def index_document(
+        self, document_data: Dict[str, Any], wait: bool = True
+    ) -> bool:
+        """索引文档
 
-        try:
-            await self.client.index(
-                index=self.index_name,
-                id=str(document_data["document_id"]),
-                document=document_data,
-            )
-            return True
-        except Exception as e:
-            logger.error(f"ES索引失败: {e}")
-            return False
+        请求进入队列，由后台协程与并发的其他请求合并为一次 _bulk 调用，
+        返回值仍对应本文档自身的索引结果
 
-    async def search_documents(
+        Args:
+            wait: 为 False 时入队后立即返回 True，不等待写入结果
+                （失败只记录日志），需要确认写入时调用 flush()
+        """
+        action = {
+            "index": {
+                "_index": self.index_name,
+                "_id": str(document_data["document_id"]),
+            }
+        }
+        return await self._enqueue(action, document_data, wait)
+
+    async def _enqueue(
         self,
+        action: Dict[str, Any],
+        document_data: Optional[Dict[str, Any]],
+        wait: bool,
+    ) -> bool:
+        """将一条 _bulk 操作放入队列，wait 为 True 时等待其执行结果"""
+        self._ensure_flusher()
+        future = asyncio.get_running_loop().create_future()
+        self._pending.add(future)
+        future.add_done_callback(self._pending.discard)
+        await self._queue.put((action, document_data, future))
+        if not wait:
+            return True
+        return await future
+
+    async def flush(self):
+        """等待所有已入队的索引/删除请求写入 ES"""
+        if self._pending:
+            await asyncio.wait(set(self._pending))
+
+    def _ensure_flusher(self):
+        """确保批量索引后台协程已启动"""
+        if self._flusher_task is None or self._flusher_task.done():
+            self._flusher_task = asyncio.create_task(self._flush_loop())
+
+    async def _flush_loop(self):
+        """持续从队列取出索引/删除请求，凑批后写入 ES"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            batch_chars = _text_size(batch[0][1])
+            deadline = loop.time() + BULK_MAX_WAIT
+            while len(batch) < BULK_MAX_BATCH and batch_chars < BULK_MAX_CHARS:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                batch.append(item)
+                batch_chars += _text_size(item[1])
+
+            # 有空闲并发额度时立即发出本批，继续收集下一批
+            await self._bulk_slots.acquire()
+            task = asyncio.create_task(self._flush_batch(batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._on_flush_done)
+
+    def _on_flush_done(self, task: asyncio.Task) -> None:
+        """一次 _bulk 请求结束，归还并发额度"""
+        self._inflight.discard(task)
+        self._bulk_slots.release()
+
+    async def _flush_batch(self, batch: List[_BulkItem]) -> None:
+        """执行一次 _bulk 请求，并按条目回写各调用方的结果"""
+        operations: List[Dict[str, Any]] = []
+        for action, document_data, _ in batch:
+            operations.append(action)
+            if document_data is not None:
+                operations.append(document_data)
+
+        try:
+            # 不强制刷新，新文档按索引的 refresh_interval 对搜索可见
+            response = await self.client.bulk(operations=operations, refresh=False)
+        except asyncio.CancelledError:
+            self._resolve_batch(batch, False)
+            raise
+        except Exception as e:
+            logger.error(f"ES批量写入失败: {e}")
+            self._resolve_batch(batch, False)
+            return
+
+        for (_, _, future), item in zip(batch, response["items"]):
+            # 每个条目形如 {"index": {...}}、{"update": {...}} 或 {"delete": {...}}；
+            # 删除不存在的文档返回 not_found，不带 error，视为成功
+            op_type, result = next(iter(item.items()))
+            error = result.get("error")
+            if error:
+                logger.error(f"ES {op_type} 失败: {error}")
+            if not future.done():
+                future.set_result(error is None)
+        self._resolve_batch(batch, False)
+
+    @staticmethod
+    def _resolve_batch(batch: List[_BulkItem], value: bool) -> None:
+        """将整批请求统一标记为指定结果"""
+        for _, _, future in batch:
+            if not future.done():
+                future.set_result(value)
+
+    @staticmethod
+    def _build_query(
         keyword: Optional[str] = None,
         template_id: Optional[int] = None,
         file_type: Optional[str] = None,
         start_date: Optional[datetime] = None,
         end_date: Optional[datetime] = None,
-        page: int = 1,
-        page_size: int = 20,
+        class_code: Optional[str] = None,
     ) -> Dict[str, Any]:
-        """搜索文档"""
-
-        query = {"bool": {"must": [], "filter": []}}
+        """根据检索条件构造 bool 查询
 
+        有关键词时，must 中的 BM25 匹配决定召回和基础得分，
+        should 中带 slop 的短语匹配为词项彼此靠近的文档额外加分；
+        其余条件都放在 filter 上下文中，不参与打分且可被 ES 缓存
+        """
+        should = []
         if keyword:
-            query["bool"]["must"].append(
+            must = [
                 {
                     "multi_match": {
                         "query": keyword,
-                        "fields": ["title^3", "content", "summary^2"],
+                        "fields": _KEYWORD_FIELDS,
                         "type": "best_fields",
                     }
                 }
+            ]
+            should.append(
+                {
+                    "multi_match": {
+                        "query": keyword,
+                        "fields": _KEYWORD_FIELDS,
+                        "type": "phrase",
+                        "slop": PROXIMITY_SLOP,
+                        "boost": PROXIMITY_BOOST,
+                    }
+                }
             )
         else:
-            query["bool"]["must"].append({"match_all": {}})
+            must = [_MATCH_ALL]
+
+        filters = [
+            {"term": {field: value}}
+            for field, value in (("template_id", template_id), ("file_type", file_type))
+            if value
+        ]
+
+        date_filter = _date_filter(start_date, end_date)
+        if date_filter is not None:
+            filters.append(date_filter)
+
+        if class_code:
+            filters.append(_class_code_filter(class_code))
+
+        query = {"bool": {"must": must, "filter": filters}}
+        if should:
+            query["bool"]["should"] = should
+        return query
+
+    @staticmethod
+    def _build_search_body(
+        query: Dict[str, Any],
+        sort: List[Dict[str, Any]],
+        page: int,
+        page_size: int,
+        cursor: Optional[List[Any]],
+    ) -> Dict[str, Any]:
+        """构造检索请求体，cursor 存在时用 search_after 代替 from"""
+        body: Dict[str, Any] = {
+            "query": query,
+            "size": page_size,
+            "sort": sort,
+            "_source": {"includes": _SEARCH_SOURCE_FIELDS},
+        }
+        if cursor:
+            body["search_after"] = cursor
+        else:
+            body["from"] = (page - 1) * page_size
+        return body
+
+    @staticmethod
+    def _parse_search_response(
+        response: Dict[str, Any], page: int, page_size: int
+    ) -> Dict[str, Any]:
+        """将检索响应转换为 search_documents 的返回格式"""
+        # filter_path 会省略空数组，无命中时 hits.hits 不存在；
+        # 未统计总数时也没有 hits.total，两者都缺失时整个 hits 都会被省略
+        hits_part = response.get("hits", {})
+        hits = hits_part.get("hits", [])
+        total = hits_part.get("total", {}).get("value")
+
+        results = []
+        for hit in hits:
+            src, score = _SRC_GET(hit)
+            results.append(
+                {
+                    "document_id": src["document_id"],
+                    "title": src["title"],
+                    "summary": src.get("summary"),
+                    "class_code": src.get("class_code"),
+                    "score": score,
+                }
+            )
 
-        if template_id:
-            query["bool"]["filter"].append({"term": {"template_id": template_id}})
+        # 不足一页说明已经到底，不再返回游标
+        next_cursor = hits[-1].get("sort") if len(hits) == page_size else None
 
-        if file_type:
-            query["bool"]["filter"].append({"term": {"file_type": file_type}})
+        return {
+            "results": results,
+            "total": total,
+            "page": page,
+            "page_size": page_size,
+            "next_cursor": next_cursor,
+        }
 
-        if start_date or end_date:
-            date_range = {}
-            if start_date:
-                date_range["gte"] = start_date.isoformat()
-            if end_date:
-                date_range["lte"] = end_date.isoformat()
-            query["bool"]["filter"].append({"range": {"upload_time": date_range}})
+    @staticmethod
+    def _empty_result(page: int, page_size: int) -> Dict[str, Any]:
+        """检索失败时返回的空结果"""
+        return {
+            "results": [],
+            "total": 0,
+            "page": page,
+            "page_size": page_size,
+            "next_cursor": None,
+        }
 
-        from_index = (page - 1) * page_size
+    async def search_documents(
+        self,
+        keyword: Optional[str] = None,
+        template_id: Optional[int] = None,
+        file_type: Optional[str] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        page: int = 1,
+        page_size: int = 20,
+        cursor: Optional[List[Any]] = None,
+        include_total: bool = True,
+        class_code: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """搜索文档
+
+        有关键词时按相关度(BM25 + 临近度加分)排序，否则按上传时间倒序
+
+        Args:
+            cursor: 上一页返回的 next_cursor。传入时使用 search_after 翻页，
+                忽略 page，深分页时无需 ES 跳过前面的命中
+            include_total: 是否统计命中总数。总数按 ES 默认规则最多精确统计到
+                10000；为 False 时不统计（total 返回 None），分片收集够一页即可提前结束
+            class_code: 分类编码，匹配该编码及其所有下级编码
+        """
+        query = self._build_query(
+            keyword, template_id, file_type, start_date, end_date, class_code
+        )
+        from_index = None if cursor else (page - 1) * page_size
 
         try:
             response = await self.client.search(
@@ -123,44 +481,120 @@ class SearchEngine:
                 query=query,
                 from_=from_index,
                 size=page_size,
-                sort=[{"upload_time": {"order": "desc"}}],
+                search_after=cursor,
+                track_total_hits=None if include_total else False,
+                sort=_RELEVANCE_SORT if keyword else _SEARCH_SORT,
+                source_includes=_SEARCH_SOURCE_FIELDS,
+                filter_path=_SEARCH_FILTER_PATH,
             )
+            return self._parse_search_response(response, page, page_size)
+        except Exception as e:
+            logger.error(f"ES搜索失败: {e}")
+            return self._empty_result(page, page_size)
 
-            hits = response["hits"]["hits"]
-            total = response["hits"]["total"]["value"]
+    async def search_documents_batch(
+        self, queries: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """批量搜索文档
 
-            results = [
-                {
-                    "document_id": hit["_source"]["document_id"],
-                    "title": hit["_source"]["title"],
-                    "summary": hit["_source"].get("summary"),
-                    "class_code": hit["_source"].get("class_code"),
-                    "score": hit["_score"],
-                }
-                for hit in hits
-            ]
+        多组检索条件(如分面统计)通过一次 _msearch 请求提交，由 ES 并行执行；
+        批量负载较大时可适当调大 ES 的 thread_pool.search.queue_size
 
-            return {
-                "results": results,
-                "total": total,
-                "page": page,
-                "page_size": page_size,
-            }
-        except Exception as e:
-            logger.error(f"ES搜索失败: {e}")
-            return {"results": [], "total": 0, "page": page, "page_size": page_size}
+        Args:
+            queries: 每项为 search_documents 的关键字参数
 
-    async def delete_document(self, document_id: int) -> bool:
-        """删除文档索引"""
+        Returns:
+            与 queries 顺序一致的检索结果，单个检索失败时对应位置为空结果
+        """
+        if not queries:
+            return []
+
+        searches: List[Dict[str, Any]] = []
+        pages = []
+        for params in queries:
+            page = params.get("page", 1)
+            page_size = params.get("page_size", 20)
+            pages.append((page, page_size))
+            query = self._build_query(
+                params.get("keyword"),
+                params.get("template_id"),
+                params.get("file_type"),
+                params.get("start_date"),
+                params.get("end_date"),
+                params.get("class_code"),
+            )
+            searches.append({"index": self.index_name})
+            searches.append(
+                self._build_search_body(
+                    query,
+                    _RELEVANCE_SORT if params.get("keyword") else _SEARCH_SORT,
+                    page,
+                    page_size,
+                    params.get("cursor"),
+                )
+            )
 
         try:
-            await self.client.delete(index=self.index_name, id=str(document_id))
-            return True
-        except Exception:
-            return False
+            response = await self.client.msearch(
+                searches=searches,
+                filter_path=_MSEARCH_FILTER_PATH,
+            )
+        except Exception as e:
+            logger.error(f"ES批量搜索失败: {e}")
+            return [self._empty_result(page, size) for page, size in pages]
+
+        results = []
+        for item, (page, page_size) in zip(response["responses"], pages):
+            if "error" in item:
+                logger.error(f"ES搜索失败: {item['error']}")
+                results.append(self._empty_result(page, page_size))
+            else:
+                results.append(self._parse_search_response(item, page, page_size))
+        return results
+
+    async def update_document(
+        self, document_id: int, fields: Dict[str, Any], wait: bool = True
+    ) -> bool:
+        """局部更新已索引文档的字段
+
+        与索引请求共用 _bulk 队列，只写入变化的字段，不重新提交全文
+
+        Args:
+            wait: 为 False 时入队后立即返回 True，不等待更新结果
+        """
+        action = {"update": {"_index": self.index_name, "_id": str(document_id)}}
+        return await self._enqueue(action, {"doc": fields}, wait)
+
+    async def delete_document(self, document_id: int, wait: bool = True) -> bool:
+        """删除文档索引
+
+        与索引请求共用 _bulk 队列，批量删除时合并为少量请求
+
+        Args:
+            wait: 为 False 时入队后立即返回 True，不等待删除结果
+        """
+        action = {"delete": {"_index": self.index_name, "_id": str(document_id)}}
+        return await self._enqueue(action, None, wait)
 
     async def close(self):
         """关闭连接"""
+        # 先把尚未写入的索引请求写完，再停止后台协程并关闭连接
+        await self.flush()
+        if self._flusher_task is not None:
+            self._flusher_task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._flusher_task
+            self._flusher_task = None
+
+        if self._leases:
+            logger.info(f"⏳ 等待 {self._leases} 个进行中的请求归还搜索引擎客户端")
+            try:
+                await asyncio.wait_for(self._idle.wait(), CLOSE_GRACE_PERIOD)
+            except asyncio.TimeoutError:
+                logger.warning(
+                    f"⚠️ 仍有 {self._leases} 个请求未归还客户端，强制关闭连接"
+                )
+
         if self.client is not None:
             await self.client.close()
             logger.info("✅ Elasticsearch 连接已关闭")
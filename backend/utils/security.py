@@ -1,25 +1,143 @@
+import base64
+import binascii
+import hashlib
+import hmac
+from calendar import timegm
 from datetime import datetime, timedelta
+from functools import lru_cache
 from typing import Optional
 
-from cryptography.fernet import Fernet
-from jose import JWTError, jwt
+import orjson
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHashError, VerificationError
+from cryptography.fernet import Fernet, InvalidToken
+from jose import ExpiredSignatureError, JWTError, jwt
 
 from config import DynamicConfig, LocalSettings
 
 # 静态配置(加密密钥不应动态变更)
 local_settings = LocalSettings()
 key = local_settings.SECRET_KEY
+# 仅用于校验旧版以 Fernet 加密保存的密码
 f = Fernet(key)
 
+# 密码使用 Argon2id 哈希
+password_hasher = PasswordHasher(time_cost=2, memory_cost=19456, parallelism=1)
+# Fernet 令牌的固定前缀，用于识别旧版密码
+_LEGACY_PASSWORD_PREFIX = "gAAAA"
+
+
+# ============= HS256 快速路径 =============
+# HS256 令牌直接用 orjson + base64 + hmac 编解码，避免 jose 的纯 Python 处理开销；
+# 其他算法仍交给 jose。两种方式生成的令牌格式一致，可以互相校验
+
+
+def _b64encode(data: bytes) -> bytes:
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+
+def _b64decode(data: bytes) -> bytes:
+    return base64.urlsafe_b64decode(data + b"=" * (-len(data) % 4))
+
+
+# 头部固定不变，模块加载时编码一次
+_HS256_HEADER = _b64encode(orjson.dumps({"alg": "HS256", "typ": "JWT"}))
+
+
+@lru_cache(maxsize=4)
+def _hmac_prototype(secret: str) -> hmac.HMAC:
+    """按密钥缓存已完成密钥预处理的 HMAC 对象
+
+    签名时 copy() 一份再 update，省去每次重新计算 ipad/opad 的开销；
+    以密钥为缓存键，配置中心更新密钥后自动使用新密钥
+    """
+    return hmac.new(secret.encode(), digestmod=hashlib.sha256)
+
+
+def _hs256_sign(secret: str, signing_input: bytes) -> bytes:
+    mac = _hmac_prototype(secret).copy()
+    mac.update(signing_input)
+    return mac.digest()
+
+
+def _encode_jwt(claims: dict, secret: str, algorithm: str) -> str:
+    """编码 JWT，claims 中的 exp 需为整数时间戳"""
+    if algorithm != "HS256":
+        return jwt.encode(claims, secret, algorithm=algorithm)
+
+    signing_input = _HS256_HEADER + b"." + _b64encode(orjson.dumps(claims))
+    signature = _hs256_sign(secret, signing_input)
+    return (signing_input + b"." + _b64encode(signature)).decode()
+
+
+def _decode_jwt(token: str, secret: str, algorithm: str) -> dict:
+    """解码并校验 JWT，校验失败抛出 JWTError"""
+    if algorithm != "HS256":
+        return jwt.decode(token, secret, algorithms=[algorithm])
+
+    try:
+        signing_input, _, signature = token.encode().rpartition(b".")
+        header_segment, _, payload_segment = signing_input.partition(b".")
+        header = orjson.loads(_b64decode(header_segment))
+        if header.get("alg") != "HS256":
+            raise JWTError("The specified alg value is not allowed")
+
+        expected = _hs256_sign(secret, signing_input)
+        if not hmac.compare_digest(expected, _b64decode(signature)):
+            raise JWTError("Signature verification failed.")
+
+        claims = orjson.loads(_b64decode(payload_segment))
+    except (ValueError, binascii.Error, AttributeError) as e:
+        raise JWTError("Invalid token") from e
+
+    if not isinstance(claims, dict):
+        raise JWTError("Invalid payload")
+
+    # 与 jose 一致：exp 早于当前时间即视为过期，nbf 晚于当前时间即尚未生效
+    now = timegm(datetime.utcnow().utctimetuple())
+    exp = claims.get("exp")
+    if exp is not None:
+        if not isinstance(exp, int):
+            raise JWTError("Expiration Time claim (exp) must be an integer.")
+        if exp < now:
+            raise ExpiredSignatureError("Signature has expired.")
+    nbf = claims.get("nbf")
+    if nbf is not None:
+        if not isinstance(nbf, int):
+            raise JWTError("Not Before claim (nbf) must be an integer.")
+        if nbf > now:
+            raise JWTError("The token is not yet valid (nbf)")
+    return claims
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """验证密码"""
-    return plain_password == f.decrypt(hashed_password.encode()).decode()
+    """验证密码
+
+    兼容旧版 Fernet 加密保存的密码，校验通过后应调用
+    password_needs_rehash 判断是否需要重新哈希
+    """
+    if hashed_password.startswith(_LEGACY_PASSWORD_PREFIX):
+        try:
+            return plain_password == f.decrypt(hashed_password.encode()).decode()
+        except InvalidToken:
+            return False
+
+    try:
+        return password_hasher.verify(hashed_password, plain_password)
+    except (VerificationError, InvalidHashError):
+        return False
 
 
 def get_password_hash(password: str) -> str:
     """生成密码哈希"""
-    return f.encrypt(password.encode()).decode()
+    return password_hasher.hash(password)
+
+
+def password_needs_rehash(hashed_password: str) -> bool:
+    """旧版 Fernet 密码或哈希参数已变更时返回 True"""
+    if hashed_password.startswith(_LEGACY_PASSWORD_PREFIX):
+        return True
+    return password_hasher.check_needs_rehash(hashed_password)
 
 
 def create_access_token(
@@ -41,12 +159,12 @@ def create_access_token(
             minutes=config.JWT_ACCESS_TOKEN_EXPIRE_MINUTES
         )
 
-    to_encode.update({"exp": expire, "type": "access"})
+    to_encode.update({"exp": timegm(expire.utctimetuple()), "type": "access"})
 
-    encoded_jwt = jwt.encode(
+    encoded_jwt = _encode_jwt(
         to_encode,
         config.JWT_SECRET_KEY,
-        algorithm=config.JWT_ALGORITHM,
+        config.JWT_ALGORITHM,
     )
 
     return encoded_jwt
@@ -62,12 +180,12 @@ def create_refresh_token(data: dict, config: DynamicConfig) -> str:
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(days=config.JWT_REFRESH_TOKEN_EXPIRE_DAYS)
 
-    to_encode.update({"exp": expire, "type": "refresh"})
+    to_encode.update({"exp": timegm(expire.utctimetuple()), "type": "refresh"})
 
-    encoded_jwt = jwt.encode(
+    encoded_jwt = _encode_jwt(
         to_encode,
         config.JWT_SECRET_KEY,
-        algorithm=config.JWT_ALGORITHM,
+        config.JWT_ALGORITHM,
     )
 
     return encoded_jwt
@@ -81,10 +199,10 @@ def decode_token(token: str, config: DynamicConfig) -> Optional[dict]:
         config: 动态配置实例
     """
     try:
-        payload = jwt.decode(
+        payload = _decode_jwt(
             token,
             config.JWT_SECRET_KEY,
-            algorithms=[config.JWT_ALGORITHM],
+            config.JWT_ALGORITHM,
         )
         return payload
     except JWTError:
@@ -1,10 +1,116 @@
-from typing import BinaryIO, Optional
+import asyncio
+import os
+import sys
+import time
+from collections import OrderedDict, defaultdict, deque
+from typing import AsyncIterator, BinaryIO, Dict, Iterable, List, Optional
 
 import opendal
+import opendal.exceptions
 from loguru import logger
+from opendal.layers import ConcurrentLimitLayer
 
 from config import DynamicConfig
 
+# 流式上传时每次从文件流读取的块大小
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+# 分片上传的分片大小与同时上传的分片数（仅对支持分片上传的后端如 S3 生效），
+# 单个上传最多缓冲 UPLOAD_PART_SIZE * UPLOAD_CONCURRENCY 字节
+UPLOAD_PART_SIZE = 16 * 1024 * 1024
+UPLOAD_CONCURRENCY = 4
+# 批量上传时同时进行的上传数
+UPLOAD_FILES_CONCURRENCY = 32
+# 超过该大小的文件下载时按范围分块并发读取
+DOWNLOAD_PARALLEL_THRESHOLD = 32 * 1024 * 1024
+DOWNLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+DOWNLOAD_CONCURRENCY = 8
+# 流式下载时每次读取的块大小
+STREAM_CHUNK_SIZE = 1024 * 1024
+# 本地文件系统后端上传时由内核直接在文件间拷贝（sendfile 写普通文件仅 Linux 支持）
+SENDFILE_SUPPORTED = sys.platform.startswith("linux")
+SENDFILE_CHUNK_SIZE = 64 * 1024 * 1024
+# 存在性检查结果短暂缓存，"先检查再上传"等连续检查不必每次都请求后端
+EXISTS_CACHE_TTL = 5.0
+EXISTS_CACHE_SIZE = 4096
+# 预签名 URL 缓存：同一对象在复用窗口内返回同一个 URL，避免每次请求都重新签名；
+# 签名时有效期额外加上复用窗口，保证返回的 URL 至少还有 expires 秒有效
+PRESIGN_CACHE_SIZE = 512
+PRESIGN_REUSE_WINDOW = 300
+# 操作耗时统计：每种操作保留最近的样本数，以及每隔多少次输出一次汇总日志
+METRICS_WINDOW = 1000
+METRICS_LOG_INTERVAL = 100
+
+
+class StorageError(Exception):
+    """对象存储读写失败，原始异常保存在 __cause__ 中"""
+
+
+class StorageMetrics:
+    """存储操作耗时与数据量统计
+
+    按 "操作:结果"（结果为 ok / error / cancelled）保留最近 METRICS_WINDOW 次的
+    (耗时, 字节数)，每 METRICS_LOG_INTERVAL 次输出一条汇总日志，
+    用于根据实际数据调整分片大小、并发数等参数，失败的操作单独统计不会拉低成功样本
+    """
+
+    def __init__(self):
+        self._samples: Dict[str, deque] = defaultdict(
+            lambda: deque(maxlen=METRICS_WINDOW)
+        )
+        self._counts: Dict[str, int] = defaultdict(int)
+
+    def observe(self, operation: str, seconds: float, size: int, status: str = "ok"):
+        """记录一次操作"""
+        label = f"{operation}:{status}"
+        self._samples[label].append((seconds, size))
+        self._counts[label] += 1
+        if self._counts[label] % METRICS_LOG_INTERVAL == 0:
+            stats = self._summarize(label)
+            logger.info(
+                f"📊 存储操作 {label} 最近 {stats['samples']} 次: "
+                f"p50 {stats['p50_ms']:.1f}ms, p99 {stats['p99_ms']:.1f}ms, "
+                f"吞吐 {stats['throughput_mb_s']:.1f}MB/s"
+            )
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """各 "操作:结果" 最近样本的统计汇总"""
+        return {label: self._summarize(label) for label in self._samples}
+
+    def _summarize(self, label: str) -> Dict[str, float]:
+        samples = self._samples[label]
+        latencies = sorted(seconds for seconds, _ in samples)
+        total_seconds = sum(latencies)
+        total_bytes = sum(size for _, size in samples)
+        count = len(latencies)
+        return {
+            "samples": count,
+            "total": self._counts[label],
+            "p50_ms": latencies[count // 2] * 1000,
+            "p99_ms": latencies[min(count - 1, int(count * 0.99))] * 1000,
+            "throughput_mb_s": (
+                total_bytes / total_seconds / 1024 / 1024 if total_seconds else 0.0
+            ),
+        }
+
+
+def _operator_key(config: DynamicConfig) -> tuple:
+    """决定 OpenDAL 算子的配置项，变更时才需要重建算子"""
+    storage_type = config.STORAGE_TYPE
+    if storage_type == "s3":
+        return (
+            storage_type,
+            config.STORAGE_BUCKET,
+            config.STORAGE_ENDPOINT,
+            config.STORAGE_REGION,
+            config.STORAGE_ACCESS_KEY,
+            config.STORAGE_SECRET_KEY,
+            config.STORAGE_ROOT,
+            config.STORAGE_MAX_CONCURRENCY,
+        )
+    if storage_type == "fs":
+        return (storage_type, config.STORAGE_ROOT)
+    return (storage_type,)
+
 
 class StorageClient:
     """对象存储客户端 (OpenDAL)"""
@@ -18,9 +124,12 @@ class StorageClient:
         """
         self.config = config
         storage_type = config.STORAGE_TYPE
+        # 本地文件系统后端的根目录，其他后端为 None
+        self._fs_root: Optional[str] = None
 
+        # 上传、下载、删除等 I/O 均走异步算子，不阻塞事件循环
         if storage_type == "s3":
-            self.operator = opendal.Operator(
+            self.async_operator = opendal.AsyncOperator(
                 "s3",
                 bucket=config.STORAGE_BUCKET,
                 endpoint=config.STORAGE_ENDPOINT,
@@ -28,21 +137,52 @@ class StorageClient:
                 access_key_id=config.STORAGE_ACCESS_KEY,
                 secret_access_key=config.STORAGE_SECRET_KEY,
                 root=config.STORAGE_ROOT,
+            ).layer(
+                # 限制同时发出的请求数，高并发上传/下载时复用连接池中的长连接，
+                # 而不是不断新建连接、重复 TLS 握手
+                ConcurrentLimitLayer(config.STORAGE_MAX_CONCURRENCY)
             )
         elif storage_type == "fs":
             # 本地文件系统
-            self.operator = opendal.Operator(
-                "fs",
-                root=config.STORAGE_ROOT or "./storage",
-            )
+            self._fs_root = os.path.abspath(config.STORAGE_ROOT or "./storage")
+            self.async_operator = opendal.AsyncOperator("fs", root=self._fs_root)
         elif storage_type == "memory":
             # 内存存储(仅用于测试)
-            self.operator = opendal.Operator("memory")
+            self.async_operator = opendal.AsyncOperator("memory")
         else:
             raise ValueError(f"Unsupported storage type: {storage_type}")
 
+        # 同步算子与异步算子共享同一后端，仅供同步的 exists 使用
+        self.operator = self.async_operator.to_operator()
+        self._operator_key = _operator_key(config)
+
+        # 存储路径前缀只在初始化和 reconfigure 时读取配置
+        self._bucket_prefix = f"{config.STORAGE_BUCKET}/"
+
+        # 存在性检查缓存：对象名 -> (是否存在, 过期时间)
+        self._exists_cache: Dict[str, tuple[bool, float]] = {}
+
+        # 预签名 URL 缓存：(对象名, 有效期) -> (URL, 签名时间)，按 LRU 淘汰
+        self._presign_cache: "OrderedDict[tuple[str, int], tuple[str, float]]" = (
+            OrderedDict()
+        )
+
+        self.metrics = StorageMetrics()
+
         logger.info(f"✅ 存储客户端初始化完成: {storage_type}")
 
+    def reconfigure(self, config: DynamicConfig) -> bool:
+        """应用新的存储配置
+
+        算子相关配置未变化时（如本地存储只修改了 bucket）直接复用现有算子，
+        避免重建后端和连接池；返回 False 表示需要重新创建存储客户端
+        """
+        if _operator_key(config) != self._operator_key:
+            return False
+        self.config = config
+        self._bucket_prefix = f"{config.STORAGE_BUCKET}/"
+        return True
+
     async def upload_file(
         self,
         file_data: BinaryIO,
@@ -53,7 +193,7 @@ class StorageClient:
         上传文件
 
         Args:
-            file_data: 文件数据流
+            file_data: 二进制文件数据流（read 返回 bytes）
             object_name: 对象名称（路径）
             content_type: 文件类型
 
@@ -61,58 +201,242 @@ class StorageClient:
             文件存储路径
         """
 
+        start = time.perf_counter()
+        size = 0
+        status = "error"
         try:
-            # 读取文件内容
-            content = file_data.read()
-            if isinstance(content, str):
-                content = content.encode("utf-8")
-
-            # 使用 OpenDAL 写入文件
-            self.operator.write(object_name, content)
+            # 源和目标都是本地文件时用 sendfile 拷贝，数据不经过 Python
+            src_fd = self._local_fileno(file_data)
+            if src_fd is not None:
+                size = await asyncio.to_thread(
+                    self._sendfile_to_fs, file_data, src_fd, object_name
+                )
+            else:
+                # 分块读取并写入，内存占用只与块大小有关，与文件大小无关；
+                # 读取本地文件流可能阻塞，放到线程中执行。
+                # 写入端按分片并发上传，读取下一块时前面的分片已在传输
+                async with await self.async_operator.open(
+                    object_name,
+                    "wb",
+                    content_type=content_type,
+                    chunk=UPLOAD_PART_SIZE,
+                    concurrent=UPLOAD_CONCURRENCY,
+                ) as writer:
+                    while True:
+                        chunk = await asyncio.to_thread(
+                            file_data.read, UPLOAD_CHUNK_SIZE
+                        )
+                        if not chunk:
+                            break
+                        await writer.write(chunk)
+                        size += len(chunk)
 
+            status = "ok"
+            self._remember_exists(object_name, True)
             # 返回存储路径
-            return f"{self.config.STORAGE_BUCKET}/{object_name}"
-        except Exception as e:
-            raise Exception(f"文件上传失败: {str(e)}")
+            return f"{self._bucket_prefix}{object_name}"
+        except (opendal.exceptions.Error, OSError) as e:
+            raise StorageError(f"文件上传失败: {e}") from e
+        finally:
+            self.metrics.observe("upload", time.perf_counter() - start, size, status)
+
+    async def upload_files(
+        self,
+        items: Iterable[tuple[BinaryIO, str]],
+        content_type: str = "application/octet-stream",
+    ) -> List[str]:
+        """
+        并发上传多个文件
+
+        Args:
+            items: (文件数据流, 对象名称) 列表
+            content_type: 文件类型
+
+        Returns:
+            与 items 顺序一致的文件存储路径列表
+        """
+        semaphore = asyncio.Semaphore(UPLOAD_FILES_CONCURRENCY)
+
+        async def upload_one(file_data: BinaryIO, object_name: str) -> str:
+            async with semaphore:
+                return await self.upload_file(file_data, object_name, content_type)
+
+        return await asyncio.gather(
+            *(upload_one(file_data, object_name) for file_data, object_name in items)
+        )
+
+    def _local_fileno(self, file_data: BinaryIO) -> Optional[int]:
+        """本地文件系统后端且数据流对应真实文件时返回其文件描述符，否则返回 None
+
+        尚在内存中的 SpooledTemporaryFile 调用 fileno() 会强制落盘，
+        这类数据流直接走分块写入，不为拿文件描述符额外写一次磁盘
+        """
+        if self._fs_root is None or not SENDFILE_SUPPORTED:
+            return None
+        if not getattr(file_data, "_rolled", True):
+            return None
+        try:
+            return file_data.fileno()
+        except (AttributeError, OSError):
+            return None
+
+    def _sendfile_to_fs(
+        self, file_data: BinaryIO, src_fd: int, object_name: str
+    ) -> int:
+        """从数据流当前位置起将剩余内容用 sendfile 写入存储目录，返回写入的字节数"""
+        path = os.path.normpath(os.path.join(self._fs_root, object_name.lstrip("/")))
+        if os.path.commonpath([path, self._fs_root]) != self._fs_root:
+            raise StorageError(f"非法的对象名称: {object_name}")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        start = offset = file_data.tell()
+        with open(path, "wb") as dst:
+            dst_fd = dst.fileno()
+            while sent := os.sendfile(dst_fd, src_fd, offset, SENDFILE_CHUNK_SIZE):
+                offset += sent
+        file_data.seek(offset)
+        return offset - start
 
     async def download_file(self, object_name: str) -> bytes:
         """下载文件"""
 
+        start = time.perf_counter()
+        size = 0
+        status = "error"
         try:
-            data = self.operator.read(object_name)
-            if isinstance(data, str):
-                data = data.encode("utf-8")
+            # 大文件拆成多个范围请求并发拉取；小文件单次读取，避免多余的请求开销
+            stat = await self.async_operator.stat(object_name)
+            if stat.content_length > DOWNLOAD_PARALLEL_THRESHOLD:
+                data = await self.async_operator.read(
+                    object_name,
+                    chunk=DOWNLOAD_CHUNK_SIZE,
+                    concurrent=DOWNLOAD_CONCURRENCY,
+                )
+            else:
+                data = await self.async_operator.read(object_name)
+            size = len(data)
+            status = "ok"
             return data
-        except Exception as e:
-            raise Exception(f"文件下载失败: {str(e)}")
+        except (opendal.exceptions.Error, OSError) as e:
+            raise StorageError(f"文件下载失败: {e}") from e
+        finally:
+            self.metrics.observe("download", time.perf_counter() - start, size, status)
+
+    async def iter_file(
+        self, object_name: str, chunk_size: int = STREAM_CHUNK_SIZE
+    ) -> AsyncIterator[bytes]:
+        """按块读取文件，供 StreamingResponse 边读边发送，内存占用与文件大小无关
+
+        客户端中途断开时生成器被关闭，本次读取记为 cancelled
+        """
+
+        start = time.perf_counter()
+        size = 0
+        status = "error"
+        try:
+            async with await self.async_operator.open(object_name, "rb") as reader:
+                while True:
+                    chunk = await reader.read(chunk_size)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    yield chunk
+            status = "ok"
+        except (GeneratorExit, asyncio.CancelledError):
+            status = "cancelled"
+            raise
+        except (opendal.exceptions.Error, OSError) as e:
+            raise StorageError(f"文件读取失败: {e}") from e
+        finally:
+            self.metrics.observe("stream", time.perf_counter() - start, size, status)
 
     async def delete_file(self, object_name: str) -> bool:
         """删除文件"""
 
+        start = time.perf_counter()
+        status = "error"
         try:
-            self.operator.delete(object_name)
+            await self.async_operator.delete(object_name)
+            status = "ok"
+            self._remember_exists(object_name, False)
             return True
-        except Exception:
+        except (opendal.exceptions.Error, OSError):
             return False
+        finally:
+            self.metrics.observe("delete", time.perf_counter() - start, 0, status)
 
-    def get_presigned_url(self, object_name: str, expires: int = 3600) -> str:
+    async def get_presigned_url(
+        self, object_name: str, expires: int = 3600
+    ) -> Optional[str]:
         """
         获取预签名 URL
 
-        注意: OpenDAL 当前版本不直接支持 presigned URL,
-        这里返回一个直接下载链接，实际上需要通过 API 端点提供下载
+        后端支持预签名（如 S3）时返回直连对象存储的签名 URL；
+        否则返回 None，由调用方改为通过后端 API 提供文件
         """
-        # 这里返回一个 API 路径，实际的下载需要通过后端 API
-        return f"/api/v1/documents/download/{object_name}"
+        if not self.async_operator.capability().presign_read:
+            return None
+
+        cache_key = (object_name, expires)
+        now = time.monotonic()
+        cached = self._presign_cache.get(cache_key)
+        if cached is not None and now - cached[1] < PRESIGN_REUSE_WINDOW:
+            self._presign_cache.move_to_end(cache_key)
+            return cached[0]
+
+        # 只统计实际签名的耗时，缓存命中不计入
+        start = time.perf_counter()
+        status = "error"
+        try:
+            request = await self.async_operator.presign_read(
+                object_name, expires + PRESIGN_REUSE_WINDOW
+            )
+            status = "ok"
+        except (opendal.exceptions.Error, OSError) as e:
+            raise StorageError(f"生成预签名 URL 失败: {e}") from e
+        finally:
+            self.metrics.observe("presign", time.perf_counter() - start, 0, status)
+        self._presign_cache[cache_key] = (request.url, now)
+        self._presign_cache.move_to_end(cache_key)
+        if len(self._presign_cache) > PRESIGN_CACHE_SIZE:
+            self._presign_cache.popitem(last=False)
+        return request.url
 
     def exists(self, object_name: str) -> bool:
+        """检查文件是否存在（同步版本，会阻塞调用线程，异步代码请使用 exists_async）"""
+
+        cached = self._cached_exists(object_name)
+        if cached is not None:
+            return cached
+        result = self.operator.exists(object_name)
+        self._remember_exists(object_name, result)
+        return result
+
+    async def exists_async(self, object_name: str) -> bool:
         """检查文件是否存在"""
 
-        try:
-            stat = self.operator.stat(object_name)
-            return stat is not None
-        except Exception:
-            return False
+        cached = self._cached_exists(object_name)
+        if cached is not None:
+            return cached
+        result = await self.async_operator.exists(object_name)
+        self._remember_exists(object_name, result)
+        return result
+
+    def _cached_exists(self, object_name: str) -> Optional[bool]:
+        """返回未过期的存在性检查结果，没有则返回 None"""
+        cached = self._exists_cache.get(object_name)
+        if cached is not None and cached[1] > time.monotonic():
+            return cached[0]
+        return None
+
+    def _remember_exists(self, object_name: str, exists: bool):
+        """记录存在性检查结果，上传、删除成功后也会更新"""
+        if len(self._exists_cache) >= EXISTS_CACHE_SIZE:
+            self._exists_cache.clear()
+        self._exists_cache[object_name] = (
+            exists,
+            time.monotonic() + EXISTS_CACHE_TTL,
+        )
 
 
 # 全局实例（在 app.state 中存储）